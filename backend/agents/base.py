@@ -4,6 +4,7 @@
 """
 
 import asyncio
+import operator
 from abc import ABC, abstractmethod
 from datetime import datetime
 from enum import Enum
@@ -86,6 +87,8 @@ class BaseAgent(ABC):
         self.created_at: datetime = datetime.utcnow()
         self.updated_at: datetime = datetime.utcnow()
         self.history: List[AgentOutput] = []
+        self._history_serialized: List[Dict[str, Any]] = []  # history 的序列化缓存
+        self._history_sources: List[AgentOutput] = []  # 缓存各项对应的历史记录对象
 
     @property
     def status(self) -> AgentState:
@@ -150,6 +153,32 @@ class BaseAgent(ABC):
         self.history.append(output)
         self.updated_at = datetime.utcnow()
 
+    def serialized_history(self) -> List[Dict[str, Any]]:
+        """
+        返回序列化后的历史记录
+
+        缓存按对象身份与当前历史记录逐项对应：追加时只序列化新增的记录；
+        历史记录被替换、截断或有记录被换成其他对象时，从第一个不一致的位置起重新序列化。
+        记录对象加入历史后不应再原地修改。
+
+        Returns:
+            List[Dict[str, Any]]: 历史记录字典列表（新列表，元素为缓存的字典）
+        """
+        history = self.history
+        sources = self._history_sources
+        cached = self._history_serialized
+        if len(sources) > len(history) or not all(map(operator.is_, sources, history)):
+            valid = next(
+                (i for i, (src, h) in enumerate(zip(sources, history)) if src is not h),
+                min(len(sources), len(history)),
+            )
+            del sources[valid:]
+            del cached[valid:]
+        new_items = history[len(sources):]
+        sources.extend(new_items)
+        cached.extend(h.dict() for h in new_items)
+        return list(cached)
+
     async def destroy(self) -> None:
         """
         销毁智能体
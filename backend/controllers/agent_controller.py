@@ -234,28 +234,40 @@ class AgentController:
             bool: 是否成功停止
         """
         async with self._agent_lock:
-            if agent_id in self._running_tasks:
-                try:
-                    task = self._running_tasks[agent_id]
-                    task.cancel()
+            return await self._stop_agent(agent_id)
 
-                    try:
-                        await task
-                    except asyncio.CancelledError:
-                        logger.debug(f"智能体任务已取消: {agent_id}")
+    async def _stop_agent(self, agent_id: int) -> bool:
+        """
+        停止正在运行的智能体（调用方需持有 _agent_lock，该锁不可重入）
 
-                    del self._running_tasks[agent_id]
-                    return True
-                except Exception as e:
-                    logger.error(f"停止智能体失败: {e}")
-                    return False
+        Args:
+            agent_id: 智能体 ID
 
-            agent = self._agents.get(agent_id)
-            if agent:
-                await agent.set_state(AgentState.IDLE)
+        Returns:
+            bool: 是否成功停止
+        """
+        if agent_id in self._running_tasks:
+            try:
+                task = self._running_tasks[agent_id]
+                task.cancel()
+
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    logger.debug(f"智能体任务已取消: {agent_id}")
+
+                del self._running_tasks[agent_id]
                 return True
+            except Exception as e:
+                logger.error(f"停止智能体失败: {e}")
+                return False
 
-            return False
+        agent = self._agents.get(agent_id)
+        if agent:
+            await agent.set_state(AgentState.IDLE)
+            return True
+
+        return False
 
     async def destroy_agent(self, agent_id: int) -> bool:
         """
@@ -268,27 +280,39 @@ class AgentController:
             bool: 是否成功销毁
         """
         async with self._agent_lock:
-            try:
-                # 停止正在运行的任务
-                await self.stop_agent(agent_id)
+            return await self._destroy_agent(agent_id)
 
-                # 从控制器中移除
-                agent = self._agents.pop(agent_id, None)
+    async def _destroy_agent(self, agent_id: int) -> bool:
+        """
+        销毁智能体（调用方需持有 _agent_lock，该锁不可重入）
 
-                if agent:
-                    await agent.destroy()
-                    logger.debug(f"智能体实例已销毁: {agent_id}")
+        Args:
+            agent_id: 智能体 ID
 
-                # 更新数据库状态
-                await DatabaseService.update_agent(
-                    agent_id, status=AgentStatus.INACTIVE
-                )
+        Returns:
+            bool: 是否成功销毁
+        """
+        try:
+            # 停止正在运行的任务
+            await self._stop_agent(agent_id)
 
-                logger.info(f"智能体已成功销毁: {agent_id}")
-                return True
-            except Exception as e:
-                logger.error(f"销毁智能体失败: {e}")
-                return False
+            # 从控制器中移除
+            agent = self._agents.pop(agent_id, None)
+
+            if agent:
+                await agent.destroy()
+                logger.debug(f"智能体实例已销毁: {agent_id}")
+
+            # 更新数据库状态
+            await DatabaseService.update_agent(
+                agent_id, status=AgentStatus.INACTIVE
+            )
+
+            logger.info(f"智能体已成功销毁: {agent_id}")
+            return True
+        except Exception as e:
+            logger.error(f"销毁智能体失败: {e}")
+            return False
 
     async def destroy_all_agents(self) -> None:
         """
@@ -296,7 +320,7 @@ class AgentController:
         """
         async with self._agent_lock:
             for agent_id in list(self._agents.keys()):
-                await self.destroy_agent(agent_id)
+                await self._destroy_agent(agent_id)
         logger.info("所有智能体已销毁")
 
     async def update_agent(
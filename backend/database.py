@@ -2,16 +2,25 @@
 数据库连接管理模块
 """
 
+import asyncio
 import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator, Optional
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 # 默认数据库路径
 DEFAULT_PERSISTENCE_DIR = Path.home() / ".metisai"
 
+# SQLite 同步级别：WAL 模式下 NORMAL 只在检查点时 fsync，提交不再逐次刷盘
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+if SQLITE_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"无效的 SQLITE_SYNCHRONOUS 配置: {SQLITE_SYNCHRONOUS}")
+
 
 def get_database_url() -> str:
     """获取数据库连接 URL"""
@@ -33,6 +42,20 @@ engine = create_async_engine(
     pool_pre_ping=True,
 )
 
+
+@event.listens_for(engine.sync_engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    """为 SQLite 连接启用 WAL 日志并设置同步级别"""
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    finally:
+        cursor.close()
+
+
 # 创建异步会话工厂
 AsyncSessionLocal = sessionmaker(
     engine,
@@ -57,3 +80,52 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             raise
         finally:
             await session.close()
+
+
+# 当前请求共享的数据库会话
+current_db_session: ContextVar[Optional[AsyncSession]] = ContextVar("current_db_session", default=None)
+
+
+async def request_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    请求级数据库会话依赖注入函数
+    请求内的所有 DatabaseService 调用共享同一个会话；每次调用结束时即提交，
+    不在整个请求期间持有写事务（SQLite 同一时刻只允许一个写者，长事务会阻塞消息缓冲区等其他写入）
+    """
+    async for session in get_db_session():
+        # 只在创建作用域的任务内复用，请求中派生的后台任务仍使用独立会话
+        session.info["owner_task"] = asyncio.current_task()
+        token = current_db_session.set(session)
+        try:
+            yield session
+        finally:
+            current_db_session.reset(token)
+
+
+@asynccontextmanager
+async def use_db_session(isolated: bool = False) -> AsyncIterator[AsyncSession]:
+    """
+    获取数据库会话
+    处于请求级会话作用域内时复用该会话，否则创建独立会话；
+    两种情况都在正常退出时提交、出错时回滚，写事务不会延续到本次调用之外
+
+    Args:
+        isolated: 是否强制使用独立会话
+    """
+    shared = None if isolated else current_db_session.get()
+    if shared is not None and shared.info.get("owner_task") is asyncio.current_task():
+        try:
+            yield shared
+            await shared.commit()
+        except Exception:
+            await shared.rollback()
+            raise
+        return
+
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
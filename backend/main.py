@@ -1,12 +1,14 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from api.agents import router as agents_router
 from api.conversations import router as conversations_router
 from api.llm import router as llm_router
+from database import request_db_session
 
-app = FastAPI(title="MetisAI", version="0.1.0")
+# 每个请求共享一个数据库会话
+app = FastAPI(title="MetisAI", version="0.1.0", dependencies=[Depends(request_db_session)])
 
 # CORS 中间件
 app.add_middleware(
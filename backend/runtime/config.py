@@ -3,12 +3,15 @@
 负责配置和管理沙箱执行环境的参数
 """
 
+import functools
+import json
 import logging
+import re
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Dict, List, Optional, Union
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator, validator
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,17 @@ class SandboxType(str, Enum):
     REMOTE = "remote"
 
 
+# 资源限制字段的格式规则：字段名 -> (正则, 错误信息)
+# CPU 为至多含一个小数点的数字（允许 '1.'、'.5'）；内存/磁盘为数字加单位 K/M/G/T，
+# 或至少两位的纯数字（字节），单个字符的值（如 '1'）视为缺少单位
+_SIZE_PATTERN = re.compile(r"^(\d+(\.\d+)?[KMGT]|\d{2,})$")
+_LIMIT_FORMATS = {
+    "cpu": (re.compile(r"^(\d+\.?\d*|\.\d+)$"), "CPU 限制必须是数字格式（例如 '1' 或 '0.5'）"),
+    "memory": (_SIZE_PATTERN, "内存限制必须是数字加单位 K/M/G/T（例如 '1G'）或纯数字（字节）"),
+    "disk": (_SIZE_PATTERN, "磁盘限制必须是数字加单位 K/M/G/T（例如 '10G'）或纯数字（字节）"),
+}
+
+
 class ResourceLimits(BaseModel):
     """资源限制配置"""
 
@@ -31,31 +45,13 @@ class ResourceLimits(BaseModel):
     timeout: int = Field(default=300, description="执行超时时间（秒）")
     max_processes: int = Field(default=10, description="最大进程数")
 
-    @validator("cpu")
-    def validate_cpu(cls, v: str) -> str:
-        """验证 CPU 限制格式"""
-        if not (v.isdigit() or (v.replace(".", "", 1).isdigit() and v.count(".") < 2)):
-            raise ValueError("CPU 限制必须是数字格式（例如 '1' 或 '0.5'）")
-        return v
-
-    @validator("memory")
-    def validate_memory(cls, v: str) -> str:
-        """验证内存限制格式"""
-        valid_suffixes = ["K", "M", "G", "T"]
-        if len(v) < 2:
-            raise ValueError("内存限制格式无效（需要包含单位，如 '1G'）")
-        if v[-1] not in valid_suffixes and not v.isdigit():
-            raise ValueError(f"内存限制必须以 {', '.join(valid_suffixes)} 结尾或纯数字（字节）")
-        return v
-
-    @validator("disk")
-    def validate_disk(cls, v: str) -> str:
-        """验证磁盘限制格式"""
-        valid_suffixes = ["K", "M", "G", "T"]
-        if len(v) < 2:
-            raise ValueError("磁盘限制格式无效（需要包含单位，如 '10G'）")
-        if v[-1] not in valid_suffixes and not v.isdigit():
-            raise ValueError(f"磁盘限制必须以 {', '.join(valid_suffixes)} 结尾或纯数字（字节）")
+    @field_validator("cpu", "memory", "disk")
+    @classmethod
+    def validate_size(cls, v: str, info: ValidationInfo) -> str:
+        """验证 CPU / 内存 / 磁盘限制格式"""
+        pattern, message = _LIMIT_FORMATS[info.field_name]
+        if not pattern.fullmatch(v):
+            raise ValueError(message)
         return v
 
 
@@ -100,7 +96,7 @@ class SandboxConfig(BaseModel):
         return v
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SandboxRuntimeOptions:
     """沙箱运行时选项"""
 
@@ -128,12 +124,17 @@ class SandboxRuntimeOptions:
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "SandboxRuntimeOptions":
-        """从字典创建实例"""
+        """
+        从字典创建实例
+
+        与 to_dict 构成可信的往返转换，嵌套模型通过 model_construct 构建，跳过 Pydantic 校验；
+        未经校验的外部输入请使用 SandboxConfigValidator.validate_options。
+        """
         return cls(
             sandbox_type=SandboxType(data.get("sandbox_type", "docker")),
-            resource_limits=ResourceLimits(**data.get("resource_limits", {})),
-            docker_config=DockerConfig(**data.get("docker_config", {})),
-            kubernetes_config=KubernetesConfig(**data.get("kubernetes_config", {})),
+            resource_limits=ResourceLimits.model_construct(**data.get("resource_limits", {})),
+            docker_config=DockerConfig.model_construct(**data.get("docker_config", {})),
+            kubernetes_config=KubernetesConfig.model_construct(**data.get("kubernetes_config", {})),
             working_dir=data.get("working_dir", "/workspace"),
             cleanup=data.get("cleanup", True),
             enable_monitoring=data.get("enable_monitoring", True),
@@ -158,7 +159,8 @@ class SandboxConfigValidator:
     def validate_options(options: Union[Dict[str, Any], SandboxRuntimeOptions]) -> SandboxRuntimeOptions:
         """验证和转换运行时选项"""
         if isinstance(options, dict):
-            return SandboxRuntimeOptions.from_dict(options)
+            # 先经 SandboxConfig 完整校验（字段与运行时选项一致），再走可信的 from_dict 构建
+            return SandboxRuntimeOptions.from_dict(SandboxConfig(**options).dict())
         elif isinstance(options, SandboxRuntimeOptions):
             return options
         else:
@@ -172,6 +174,12 @@ class SandboxConfigValidator:
         return SandboxConfig(**config_dict)
 
 
+@functools.lru_cache(maxsize=64)
+def _create_config_cached(config_key: str) -> SandboxConfig:
+    """根据规范化的配置 JSON 创建配置（结果按键缓存）"""
+    return SandboxConfig(**json.loads(config_key))
+
+
 class SandboxConfigManager:
     """沙箱配置管理器"""
 
@@ -199,9 +207,19 @@ class SandboxConfigManager:
 
     @classmethod
     def validate_and_create(cls, config_data: Dict[str, Any]) -> SandboxConfig:
-        """验证并创建配置"""
+        """
+        验证并创建配置
+
+        相同的配置数据会复用已缓存的 SandboxConfig 实例，调用方不应修改返回的配置。
+        """
         try:
-            config = SandboxConfig(**config_data)
+            try:
+                config_key = json.dumps(config_data, sort_keys=True)
+            except TypeError:
+                # 包含无法序列化的值（如模型实例）时不走缓存
+                config = SandboxConfig(**config_data)
+            else:
+                config = _create_config_cached(config_key)
             logger.debug(f"配置验证成功: {config.sandbox_type}")
             return config
         except Exception as e:
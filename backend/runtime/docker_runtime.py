@@ -7,9 +7,19 @@ import asyncio
 import json
 import logging
 import os
+import secrets
 import subprocess
+import sys
+import time
 from typing import Any, Dict, List, Optional, Union
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # orjson 为可选依赖，未安装时使用标准库
+    _json_loads = json.loads
+
 from backend.runtime.config import (
     DEFAULT_CONFIG,
     DockerConfig,
@@ -21,6 +31,20 @@ from backend.runtime.config import (
 
 logger = logging.getLogger(__name__)
 
+# 容器记录的字段名（预先驻留，避免每次创建容器时重复哈希）
+_K_CID = sys.intern("container_id")
+_K_NAME = sys.intern("name")
+_K_OPTS = sys.intern("options")
+_K_STATUS = sys.intern("status")
+_K_CTIME = sys.intern("created_at")
+
+# 容器名称前缀
+_CONTAINER_NAME_PREFIX = "openhands-"
+
+# 流式读取命令输出的块大小与单个输出流的最大缓冲（超出部分只保留末尾）
+_READ_CHUNK_SIZE = 8192
+_MAX_OUTPUT_BYTES = 8 * 1024 * 1024
+
 
 class DockerRuntime:
     """
@@ -37,7 +61,6 @@ class DockerRuntime:
         """
         self.config = config or DEFAULT_CONFIG
         self._containers: Dict[str, Dict[str, Any]] = {}
-        self._lock = asyncio.Lock()
         self._initialized = False
 
     async def initialize(self) -> None:
@@ -94,6 +117,93 @@ class DockerRuntime:
 
         return stdout_str
 
+    @staticmethod
+    async def _read_stream(stream: asyncio.StreamReader, limit: int = _MAX_OUTPUT_BYTES) -> bytes:
+        """
+        分块读取输出流，缓冲区超过上限时丢弃最早的数据
+
+        Args:
+            stream: 输出流
+            limit: 缓冲区上限（字节）
+
+        Returns:
+            bytes: 输出内容（最多保留末尾 limit 字节）
+        """
+        buffer = bytearray()
+        while True:
+            chunk = await stream.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer += chunk
+            if len(buffer) > limit:
+                del buffer[: len(buffer) - limit]
+        return bytes(buffer)
+
+    async def _stream_docker_command(self, args: List[str], timeout: float) -> str:
+        """
+        以流式读取方式运行 Docker 命令，适用于输出量大或耗时较长的命令
+
+        Args:
+            args: 命令参数
+            timeout: 超时时间（秒）
+
+        Returns:
+            str: 命令输出
+
+        Raises:
+            asyncio.TimeoutError: 命令执行超时（子进程会被终止）
+        """
+        logger.debug(f"执行 Docker 命令: docker {' '.join(args)}")
+
+        proc = await asyncio.create_subprocess_exec(
+            "docker",
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+        try:
+            stdout, stderr, _ = await asyncio.wait_for(
+                asyncio.gather(
+                    self._read_stream(proc.stdout),
+                    self._read_stream(proc.stderr),
+                    proc.wait(),
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            # 超时后终止子进程，避免进程泄漏
+            proc.kill()
+            await proc.wait()
+            raise
+
+        stdout_str = stdout.decode(errors="replace").strip()
+        stderr_str = stderr.decode(errors="replace").strip()
+
+        if proc.returncode != 0:
+            logger.error(f"Docker 命令执行失败: {stderr_str}")
+            raise Exception(f"Docker 命令执行失败: {stderr_str}")
+
+        return stdout_str
+
+    def _get_container_info(self, container_id: str) -> Dict[str, Any]:
+        """
+        获取已记录的容器信息
+
+        Args:
+            container_id: 容器 ID
+
+        Returns:
+            Dict[str, Any]: 容器记录
+
+        Raises:
+            Exception: 容器未找到
+        """
+        try:
+            return self._containers[container_id]
+        except KeyError:
+            raise Exception(f"容器未找到: {container_id}") from None
+
     async def create_container(
         self,
         options: Optional[SandboxRuntimeOptions] = None,
@@ -114,63 +224,63 @@ class DockerRuntime:
 
         options = options or SandboxRuntimeOptions()
 
-        async with self._lock:
-            container_config = self._build_container_config(options)
-
-            # 创建容器
-            cmd = [
-                "create",
-                "--name",
-                container_config["name"],
-                "--workdir",
-                options.working_dir,
-                "--network",
-                options.docker_config.network_mode,
-            ]
-
-            # 添加资源限制
-            cmd.extend(["--cpus", options.resource_limits.cpu])
-            cmd.extend(["--memory", options.resource_limits.memory])
-
-            # 添加挂载卷
-            if options.docker_config.volumes:
-                for host_path, container_path in options.docker_config.volumes.items():
-                    cmd.extend(["-v", f"{host_path}:{container_path}"])
-
-            # 添加环境变量
-            if options.docker_config.environment:
-                for key, value in options.docker_config.environment.items():
-                    cmd.extend(["-e", f"{key}={value}"])
-
-            # 添加特权模式
-            if options.docker_config.privileged:
-                cmd.append("--privileged")
-
-            cmd.append(options.docker_config.image)
-
-            # 添加入口点和命令
-            if options.docker_config.entrypoint:
-                cmd.extend(["--entrypoint", options.docker_config.entrypoint])
-
-            if options.docker_config.command:
-                cmd.append(options.docker_config.command)
-
-            container_id = await self._run_docker_command(cmd)
-
-            # 启动容器
-            await self._run_docker_command(["start", container_id])
-
-            # 记录容器信息
-            self._containers[container_id] = {
-                "container_id": container_id,
-                "name": container_config["name"],
-                "options": options.dict(),
-                "status": "running",
-                "created_at": asyncio.get_event_loop().time(),
-            }
+        # 容器名称随机唯一，创建过程无需全局加锁，多个容器可并发创建
+        container_config = self._build_container_config(options)
+
+        # 创建容器
+        cmd = [
+            "create",
+            "--name",
+            container_config["name"],
+            "--workdir",
+            options.working_dir,
+            "--network",
+            options.docker_config.network_mode,
+        ]
+
+        # 添加资源限制
+        cmd.extend(["--cpus", options.resource_limits.cpu])
+        cmd.extend(["--memory", options.resource_limits.memory])
+
+        # 添加挂载卷
+        if options.docker_config.volumes:
+            for host_path, container_path in options.docker_config.volumes.items():
+                cmd.extend(["-v", f"{host_path}:{container_path}"])
+
+        # 添加环境变量
+        if options.docker_config.environment:
+            for key, value in options.docker_config.environment.items():
+                cmd.extend(["-e", f"{key}={value}"])
+
+        # 添加特权模式
+        if options.docker_config.privileged:
+            cmd.append("--privileged")
+
+        cmd.append(options.docker_config.image)
+
+        # 添加入口点和命令
+        if options.docker_config.entrypoint:
+            cmd.extend(["--entrypoint", options.docker_config.entrypoint])
+
+        if options.docker_config.command:
+            cmd.append(options.docker_config.command)
+
+        container_id = await self._run_docker_command(cmd)
+
+        # 启动容器
+        await self._run_docker_command(["start", container_id])
+
+        # 记录容器信息（单次字典赋值，无需加锁）
+        self._containers[container_id] = {
+            _K_CID: container_id,
+            _K_NAME: container_config["name"],
+            _K_OPTS: options.to_dict(),
+            _K_STATUS: "running",
+            _K_CTIME: time.monotonic(),
+        }
 
-            logger.info(f"Docker 容器创建成功: {container_id} ({container_config['name']})")
-            return container_id
+        logger.info(f"Docker 容器创建成功: {container_id} ({container_config['name']})")
+        return container_id
 
     def _build_container_config(self, options: SandboxRuntimeOptions) -> Dict[str, Any]:
         """
@@ -183,9 +293,7 @@ class DockerRuntime:
             Dict[str, Any]: 容器配置
         """
         # 生成唯一的容器名称
-        import uuid
-
-        container_name = f"openhands-{uuid.uuid4().hex[:12]}"
+        container_name = _CONTAINER_NAME_PREFIX + secrets.token_hex(6)
 
         return {
             "name": container_name,
@@ -213,8 +321,7 @@ class DockerRuntime:
         Returns:
             Dict[str, Any]: 执行结果
         """
-        if container_id not in self._containers:
-            raise Exception(f"容器未找到: {container_id}")
+        self._get_container_info(container_id)
 
         timeout = timeout or self.config.resource_limits.timeout
 
@@ -224,10 +331,7 @@ class DockerRuntime:
             cmd = ["exec", container_id]
             cmd.extend(["sh", "-c", command])
 
-            result = await asyncio.wait_for(
-                self._run_docker_command(cmd),
-                timeout=timeout,
-            )
+            result = await self._stream_docker_command(cmd, timeout)
 
             logger.debug(f"命令执行成功: {container_id}")
             return {
@@ -271,8 +375,7 @@ class DockerRuntime:
         Returns:
             bool: 是否成功
         """
-        if container_id not in self._containers:
-            raise Exception(f"容器未找到: {container_id}")
+        self._get_container_info(container_id)
 
         try:
             await self._run_docker_command(["cp", host_path, f"{container_id}:{container_path}"])
@@ -299,8 +402,7 @@ class DockerRuntime:
         Returns:
             bool: 是否成功
         """
-        if container_id not in self._containers:
-            raise Exception(f"容器未找到: {container_id}")
+        self._get_container_info(container_id)
 
         try:
             await self._run_docker_command(["cp", f"{container_id}:{container_path}", host_path])
@@ -320,35 +422,34 @@ class DockerRuntime:
         Returns:
             Dict[str, Any]: 容器状态信息
         """
-        if container_id not in self._containers:
-            raise Exception(f"容器未找到: {container_id}")
+        info = self._get_container_info(container_id)
 
         try:
             inspect_info = await self._run_docker_command(["inspect", container_id])
-            info = json.loads(inspect_info)[0]
+            inspect_data = _json_loads(inspect_info)[0]
 
-            status = info["State"]["Status"]
-            cpu_usage = info["Stats"]["cpu_stats"]["cpu_usage"]["total_usage"] if "Stats" in info else 0
-            memory_usage = info["Stats"]["memory_stats"]["usage"] if "Stats" in info else 0
+            status = inspect_data["State"]["Status"]
+            cpu_usage = inspect_data["Stats"]["cpu_stats"]["cpu_usage"]["total_usage"] if "Stats" in inspect_data else 0
+            memory_usage = inspect_data["Stats"]["memory_stats"]["usage"] if "Stats" in inspect_data else 0
 
             return {
                 "container_id": container_id,
-                "name": self._containers[container_id]["name"],
+                "name": info[_K_NAME],
                 "status": status,
                 "cpu_usage": cpu_usage,
                 "memory_usage": memory_usage,
-                "created_at": self._containers[container_id]["created_at"],
+                "created_at": info[_K_CTIME],
             }
 
         except Exception as e:
             logger.error(f"获取容器状态失败: {container_id}, {e}")
             return {
                 "container_id": container_id,
-                "name": self._containers[container_id]["name"],
+                "name": info[_K_NAME],
                 "status": "unknown",
                 "cpu_usage": 0,
                 "memory_usage": 0,
-                "created_at": self._containers[container_id]["created_at"],
+                "created_at": info[_K_CTIME],
                 "error": str(e),
             }
 
@@ -362,12 +463,11 @@ class DockerRuntime:
         Returns:
             bool: 是否成功
         """
-        if container_id not in self._containers:
-            raise Exception(f"容器未找到: {container_id}")
+        info = self._get_container_info(container_id)
 
         try:
             await self._run_docker_command(["stop", container_id])
-            self._containers[container_id]["status"] = "stopped"
+            info[_K_STATUS] = "stopped"
             logger.info(f"容器已停止: {container_id}")
             return True
         except Exception as e:
@@ -385,13 +485,11 @@ class DockerRuntime:
         Returns:
             bool: 是否成功
         """
-        if container_id not in self._containers:
-            raise Exception(f"容器未找到: {container_id}")
+        info = self._get_container_info(container_id)
 
         try:
-            # 如果容器正在运行，先停止
-            status = await self.get_container_status(container_id)
-            if status["status"] == "running":
+            # 非强制移除时，若容器正在运行则先停止（docker rm -f 本身会停止容器）
+            if not force and info[_K_STATUS] == "running":
                 await self.stop_container(container_id)
 
             cmd = ["rm"]
@@ -401,7 +499,7 @@ class DockerRuntime:
 
             await self._run_docker_command(cmd)
 
-            del self._containers[container_id]
+            self._containers.pop(container_id, None)
             logger.info(f"容器已移除: {container_id}")
             return True
 
@@ -452,11 +550,41 @@ class DockerRuntime:
         logger.info("所有容器资源清理完成")
 
 
+# 全局 Docker 运行时单例
+_singleton: Optional[DockerRuntime] = None
+_singleton_lock = asyncio.Lock()
+
+
+async def get_docker_runtime(config: Optional[SandboxConfig] = None) -> DockerRuntime:
+    """
+    获取全局 Docker 运行时实例
+
+    已初始化时直接返回，无需加锁；首次创建由锁保护，避免并发调用重复创建和初始化。
+
+    Args:
+        config: 配置（仅在首次创建时生效）
+
+    Returns:
+        DockerRuntime: 运行时实例
+    """
+    global _singleton
+
+    if _singleton is not None:
+        return _singleton
+
+    async with _singleton_lock:
+        if _singleton is None:
+            # 初始化完成后才对外可见：并发调用不会拿到未初始化的实例，初始化失败时下次调用重新创建
+            runtime = DockerRuntime(config)
+            await runtime.initialize()
+            _singleton = runtime
+
+    return _singleton
+
+
 class DockerRuntimeFactory:
     """Docker 运行时工厂类"""
 
-    _instance: Optional["DockerRuntime"] = None
-
     @staticmethod
     async def get_instance(config: Optional[SandboxConfig] = None) -> "DockerRuntime":
         """
@@ -468,10 +596,7 @@ class DockerRuntimeFactory:
         Returns:
             DockerRuntime: 运行时实例
         """
-        if DockerRuntimeFactory._instance is None:
-            DockerRuntimeFactory._instance = DockerRuntime(config)
-            await DockerRuntimeFactory._instance.initialize()
-        return DockerRuntimeFactory._instance
+        return await get_docker_runtime(config)
 
     @staticmethod
     async def create_new_instance(config: Optional[SandboxConfig] = None) -> "DockerRuntime":
@@ -7,9 +7,11 @@ import asyncio
 import logging
 import sys
 import tempfile
+import time
 import unittest
 from pathlib import Path
 from typing import Any, Dict, List, Optional
+from unittest.mock import patch
 
 sys.path.append("E:/Project/MetisAI/MetisAI_03")
 
@@ -28,11 +30,14 @@ from backend.runtime.config import (
     LOCAL_CONFIG,
     DOCKER_CONFIG,
     KUBERNETES_CONFIG,
+    ResourceLimits,
     SandboxConfig,
     SandboxRuntimeOptions,
     SandboxType,
     SandboxConfigManager,
+    _create_config_cached,
 )
+from backend.runtime import docker_runtime
 from backend.runtime.docker_runtime import DockerRuntime, DockerRuntimeFactory
 
 # 配置日志
@@ -44,6 +49,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def _wait_for_action_result(server: ActionServer, action_id: str, deadline: float = 5.0):
+    """轮询动作结果（指数退避），直到动作完成或超过截止时间"""
+    step = 0.01
+    start = time.monotonic()
+    while time.monotonic() - start < deadline:
+        result = await server.get_action_result(action_id)
+        if result is not None:
+            return result
+        await asyncio.sleep(step)
+        step = min(step * 2, 0.2)
+    return None
+
+
 class TestSandboxConfig(unittest.IsolatedAsyncioTestCase):
     """测试沙箱配置系统"""
 
@@ -105,6 +123,66 @@ class TestSandboxConfig(unittest.IsolatedAsyncioTestCase):
 
         logger.info("测试配置验证完成")
 
+    async def test_resource_limit_validation(self):
+        """测试资源限制格式验证"""
+        # CPU：至多含一个小数点的数字
+        for cpu in ("1", "0.5", "1.", ".5", "16"):
+            with self.subTest(cpu=cpu):
+                self.assertEqual(ResourceLimits(cpu=cpu).cpu, cpu)
+        for cpu in ("", ".", "1.2.3", "1G", "abc", "1\n"):
+            with self.subTest(cpu=cpu):
+                with self.assertRaises(ValueError):
+                    ResourceLimits(cpu=cpu)
+
+        # 内存/磁盘：数字加单位，或至少两位的纯数字（字节）
+        for size in ("1G", "512M", "1.5G", "10", "1024"):
+            with self.subTest(size=size):
+                self.assertEqual(ResourceLimits(memory=size, disk=size).memory, size)
+        for size in ("1", "G", "", "abcG", "1X", "1.G", "1G\n"):
+            for field_name in ("memory", "disk"):
+                with self.subTest(field=field_name, size=size):
+                    with self.assertRaises(ValueError):
+                        ResourceLimits(**{field_name: size})
+
+    async def test_validate_and_create_cache_key(self):
+        """测试配置缓存按规范化的配置内容命中"""
+        _create_config_cached.cache_clear()
+
+        config_data = {
+            "sandbox_type": "local",
+            "working_dir": "/cache-key",
+            "resource_limits": {"cpu": "2", "memory": "2G"},
+        }
+        reordered = {
+            "resource_limits": {"memory": "2G", "cpu": "2"},
+            "working_dir": "/cache-key",
+            "sandbox_type": "local",
+        }
+
+        first = SandboxConfigManager.validate_and_create(config_data)
+        # 键顺序不同的相同配置命中同一缓存项
+        self.assertIs(SandboxConfigManager.validate_and_create(reordered), first)
+        self.assertEqual(_create_config_cached.cache_info().hits, 1)
+
+        # 内容不同的配置不命中
+        other = SandboxConfigManager.validate_and_create({**config_data, "working_dir": "/other"})
+        self.assertIsNot(other, first)
+        self.assertEqual(other.working_dir, "/other")
+
+        # 无法序列化为 JSON 的配置不走缓存
+        uncached = {**config_data, "resource_limits": ResourceLimits(cpu="2")}
+        misses = _create_config_cached.cache_info().misses
+        self.assertIsNot(
+            SandboxConfigManager.validate_and_create(uncached),
+            SandboxConfigManager.validate_and_create(uncached),
+        )
+        self.assertEqual(_create_config_cached.cache_info().misses, misses)
+
+        # 无效配置不会被缓存
+        with self.assertRaises(ValueError):
+            SandboxConfigManager.validate_and_create({"resource_limits": {"memory": "1"}})
+        self.assertEqual(_create_config_cached.cache_info().currsize, 2)
+
 
 class TestDockerRuntime(unittest.IsolatedAsyncioTestCase):
     """测试 Docker 运行时"""
@@ -132,6 +210,59 @@ class TestDockerRuntime(unittest.IsolatedAsyncioTestCase):
             logger.warning(f"Docker 不可用: {e}")
             self.skipTest("Docker 服务未运行或不可用")
 
+    async def test_singleton_published_after_initialize(self):
+        """测试全局运行时初始化完成后才对外可见，并发调用只初始化一次"""
+        started = asyncio.Event()
+        release = asyncio.Event()
+        initialized: List[DockerRuntime] = []
+
+        async def slow_initialize(runtime: DockerRuntime) -> None:
+            initialized.append(runtime)
+            started.set()
+            await release.wait()
+            runtime._initialized = True
+
+        with patch.object(docker_runtime, "_singleton", None), patch.object(
+            docker_runtime, "_singleton_lock", asyncio.Lock()
+        ), patch.object(DockerRuntime, "initialize", slow_initialize):
+            first = asyncio.create_task(docker_runtime.get_docker_runtime())
+            await started.wait()
+            second = asyncio.create_task(docker_runtime.get_docker_runtime())
+            await asyncio.sleep(0)
+
+            # 初始化进行中：实例尚未登记，后来的调用在锁上等待
+            self.assertIsNone(docker_runtime._singleton)
+            self.assertFalse(second.done())
+
+            release.set()
+            runtimes = await asyncio.gather(first, second)
+
+        self.assertIs(runtimes[0], runtimes[1])
+        self.assertTrue(runtimes[0]._initialized)
+        self.assertEqual(len(initialized), 1)
+
+    async def test_singleton_retried_after_failed_initialize(self):
+        """测试初始化失败时不登记实例，下次调用重新创建并初始化"""
+        attempts: List[DockerRuntime] = []
+
+        async def flaky_initialize(runtime: DockerRuntime) -> None:
+            attempts.append(runtime)
+            if len(attempts) == 1:
+                raise RuntimeError("docker unavailable")
+            runtime._initialized = True
+
+        with patch.object(docker_runtime, "_singleton", None), patch.object(
+            docker_runtime, "_singleton_lock", asyncio.Lock()
+        ), patch.object(DockerRuntime, "initialize", flaky_initialize):
+            with self.assertRaises(RuntimeError):
+                await docker_runtime.get_docker_runtime()
+            self.assertIsNone(docker_runtime._singleton)
+
+            runtime = await docker_runtime.get_docker_runtime()
+
+        self.assertIs(runtime, attempts[1])
+        self.assertTrue(runtime._initialized)
+
 
 class TestActionExecutor(unittest.IsolatedAsyncioTestCase):
     """测试动作执行器"""
@@ -140,7 +271,12 @@ class TestActionExecutor(unittest.IsolatedAsyncioTestCase):
         """测试动作执行器初始化"""
         logger.info("开始测试动作执行器初始化")
 
-        executor = await ActionExecutorFactory.create_executor()
+        try:
+            executor = await ActionExecutorFactory.create_executor()
+        except Exception as e:
+            # 默认执行器依赖已初始化的 Docker 运行时
+            logger.warning(f"Docker 不可用: {e}")
+            self.skipTest("Docker 服务未运行或不可用")
         self.assertIsInstance(executor, ActionExecutor)
         logger.debug("动作执行器实例创建成功")
 
@@ -182,11 +318,8 @@ class TestActionExecution(unittest.IsolatedAsyncioTestCase):
             self.assertIsNotNone(action_id)
             logger.debug(f"动作提交成功，ID: {action_id}")
 
-            # 等待动作完成
-            await asyncio.sleep(2)
-
-            # 检查动作结果
-            result = await server.get_action_result(action_id)
+            # 等待动作完成并检查动作结果
+            result = await _wait_for_action_result(server, action_id)
             self.assertIsNotNone(result)
             self.assertEqual(result.status, ActionStatus.COMPLETED)
 
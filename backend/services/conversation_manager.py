@@ -4,16 +4,23 @@
 """
 
 import asyncio
+import heapq
 import logging
+import random
+import time
+from collections import defaultdict, deque
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
 
 from models.conversation import Conversation, ConversationStatus
 from models.message import Message, MessageRole
-from services.db_service import DatabaseService
+from services.db_service import DatabaseService, MessageWriteError, message_write_buffer
 
 logger = logging.getLogger(__name__)
 
+# 每个会话在内存中保留的最近消息数量
+MESSAGE_WINDOW_SIZE = 1024
+
 
 class Session:
     """
@@ -46,37 +53,69 @@ class Session:
         self.metadata = metadata or {}
         self.status = ConversationStatus.ACTIVE
         self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
+        self._updated_at: datetime = self.created_at
+        self._updated_at_mono: Optional[float] = None  # 最近一次变更的 time.monotonic 时间，读取时再换算
         self.completed_at: Optional[datetime] = None
-        self._messages: List[Message] = []
-        self._timeout_task: Optional[asyncio.Task] = None
+        self._messages: deque[Message] = deque(maxlen=MESSAGE_WINDOW_SIZE)
+        self._message_count: int = 0
+        self._deadline: float = float("inf")  # 超时截止时间（time.monotonic 时钟）
+        self._owner: Optional["ConversationManager"] = None  # 管理该会话的会话管理器
         self._lock = asyncio.Lock()
+        self._version: int = 0  # 会话状态每次变更时递增
+        self._cached_dict_version: int = -1
+        self._cached_dict: Dict[str, Any] = {}
 
     @property
     def is_active(self) -> bool:
         """判断会话是否处于活动状态"""
         return self.status == ConversationStatus.ACTIVE
 
+    @property
+    def updated_at(self) -> datetime:
+        """会话更新时间（热路径只记录单调时钟，读取时换算为 UTC 时间）"""
+        if self._updated_at_mono is not None:
+            elapsed = time.monotonic() - self._updated_at_mono
+            self._updated_at = datetime.utcnow() - timedelta(seconds=elapsed)
+            self._updated_at_mono = None
+        return self._updated_at
+
+    @updated_at.setter
+    def updated_at(self, value: datetime) -> None:
+        self._updated_at = value
+        self._updated_at_mono = None
+
     @property
     def message_count(self) -> int:
-        """获取消息数量"""
-        return len(self._messages)
+        """获取消息数量（缓存值，无需加载消息列表）"""
+        return self._message_count
 
     @property
     def session_dict(self) -> Dict[str, Any]:
-        """返回会话的字典表示"""
-        return {
-            "session_id": self.session_id,
-            "user_id": self.user_id,
-            "agent_id": self.agent_id,
-            "title": self.title,
-            "status": self.status.value,
-            "metadata": self.metadata,
-            "message_count": self.message_count,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat(),
-            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
-        }
+        """
+        返回会话的字典表示
+
+        状态未变更时复用上次格式化的字段；每次返回新的字典，元数据也是副本，
+        调用方修改返回值不会影响缓存或会话本身。
+        """
+        if self._cached_dict_version != self._version:
+            self._cached_dict = {
+                "session_id": self.session_id,
+                "user_id": self.user_id,
+                "agent_id": self.agent_id,
+                "title": self.title,
+                "status": self.status.value,
+                "message_count": self.message_count,
+                "created_at": self.created_at.isoformat(),
+                "updated_at": self.updated_at.isoformat(),
+                "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            }
+            self._cached_dict_version = self._version
+        return {**self._cached_dict, "metadata": dict(self.metadata)}
+
+    def _touch(self) -> None:
+        """记录会话状态变更：刷新更新时间并使字典缓存失效"""
+        self._updated_at_mono = time.monotonic()
+        self._version += 1
 
     async def add_message(self, role: MessageRole, content: str, metadata: Optional[Dict[str, Any]] = None) -> Message:
         """
@@ -98,86 +137,87 @@ class Session:
                 metadata_=metadata,
             )
 
-            # 保存到数据库
-            await DatabaseService.create_message(message)
+            # 加入批量写入缓冲区，由缓冲区合并提交到数据库
+            message_write_buffer.add(message)
             self._messages.append(message)
-            self.updated_at = datetime.utcnow()
+            self._set_message_count(self._message_count + 1)
+            self._touch()
 
-            logger.debug(f"消息已添加到会话: {self.session_id}, 角色: {role}")
+            logger.debug("消息已添加到会话: %s, 角色: %s", self.session_id, role)
             return message
 
     async def get_messages(self) -> List[Message]:
-        """获取会话的所有消息"""
+        """获取会话最近的消息（最多 MESSAGE_WINDOW_SIZE 条，按时间正序）"""
         async with self._lock:
-            if not self._messages:
-                # 从数据库加载消息
-                self._messages = await DatabaseService.get_messages_by_conversation(self.session_id)
+            if not self._messages or len(self._messages) < min(self._message_count, MESSAGE_WINDOW_SIZE):
+                # 内存窗口不完整时从数据库加载最近的消息
+                messages = await DatabaseService.get_recent_messages(self.session_id, MESSAGE_WINDOW_SIZE)
+                self._messages.clear()
+                self._messages.extend(messages)
+                self._set_message_count(max(self._message_count, len(messages)))
             return list(self._messages)
 
+    def _set_message_count(self, count: int) -> None:
+        """更新消息数量，并同步管理器的消息总数"""
+        if self._owner is not None:
+            self._owner._total_messages += count - self._message_count
+        self._message_count = count
+        self._version += 1
+
     async def complete(self) -> None:
         """完成会话"""
-        async with self._lock:
-            self.status = ConversationStatus.COMPLETED
-            self.completed_at = datetime.utcnow()
-            self.updated_at = datetime.utcnow()
-
-            # 更新数据库中的会话状态
-            await DatabaseService.update_conversation(
-                self.session_id,
-                status=ConversationStatus.COMPLETED,
-                completed_at=self.completed_at,
-            )
-
-            # 取消超时任务
-            if self._timeout_task:
-                self._timeout_task.cancel()
-
-            logger.info(f"会话已完成: {self.session_id}")
+        await self._finish(ConversationStatus.COMPLETED)
+        logger.info(f"会话已完成: {self.session_id}")
 
     async def cancel(self) -> None:
         """取消会话"""
-        async with self._lock:
-            self.status = ConversationStatus.CANCELED
-            self.completed_at = datetime.utcnow()
-            self.updated_at = datetime.utcnow()
-
-            # 更新数据库中的会话状态
-            await DatabaseService.update_conversation(
-                self.session_id,
-                status=ConversationStatus.CANCELED,
-                completed_at=self.completed_at,
-            )
+        await self._finish(ConversationStatus.CANCELED)
+        logger.info(f"会话已取消: {self.session_id}")
 
-            # 取消超时任务
-            if self._timeout_task:
-                self._timeout_task.cancel()
+    async def _finish(self, status: ConversationStatus) -> None:
+        """
+        结束会话：立即切换内存状态，再在会话锁内持久化
 
-            logger.info(f"会话已取消: {self.session_id}")
+        Args:
+            status: 结束后的会话状态
+        """
+        # 内存状态的切换不含 await，无需等待会话锁，调用方和其他协程立即可见
+        self.status = status
+        if self._owner is not None:
+            self._owner._mark_inactive(self.session_id)
+        self.completed_at = datetime.utcnow()
+        self._touch()
 
-    async def set_timeout(self, timeout: float = 3600.0) -> None:
+        async with self._lock:
+            # 写入缓冲中的消息，并更新数据库中的会话状态；
+            # 写入的是当前最新状态，并发结束时以最后一次切换为准
+            # 消息写入失败时仍持久化会话状态，异常在之后抛给调用方
+            try:
+                await message_write_buffer.flush()
+            finally:
+                await DatabaseService.update_conversation(
+                    self.session_id,
+                    status=self.status,
+                    completed_at=self.completed_at,
+                )
+
+    def set_timeout(self, timeout: float = 3600.0) -> None:
         """
         设置会话超时时间
 
+        只更新截止时间，到期后由会话管理器统一完成会话；未交由管理器管理的会话不会自动超时。
+
         Args:
             timeout: 超时时间（秒），默认 1 小时
         """
-        # 取消之前的超时任务
-        if self._timeout_task:
-            self._timeout_task.cancel()
-
-        async def timeout_handler():
-            await asyncio.sleep(timeout)
-            if self.is_active:
-                logger.warning(f"会话超时，自动完成: {self.session_id}")
-                await self.complete()
-
-        self._timeout_task = asyncio.create_task(timeout_handler())
+        self._deadline = time.monotonic() + timeout
+        if self._owner is not None:
+            self._owner._schedule_expiry(self)
         logger.debug(f"会话超时已设置: {self.session_id}, 超时时间: {timeout} 秒")
 
     async def cleanup(self) -> None:
         """清理会话资源"""
-        if self._timeout_task:
-            self._timeout_task.cancel()
+        self._owner = None
         self._messages.clear()
         logger.debug(f"会话资源已清理: {self.session_id}")
 
@@ -186,28 +226,31 @@ class ConversationManager:
     """
     会话管理器
     负责会话的创建、管理和资源清理
-    """
 
-    _instance = None
-    _initialized = False
-
-    def __new__(cls, *args, **kwargs):
-        """单例模式实现"""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    全局实例通过 get_conversation_manager 获取，不在构造函数中实现单例
+    """
 
     def __init__(self):
         """初始化会话管理器"""
-        if ConversationManager._initialized:
-            return
-        ConversationManager._initialized = True
-
         self._sessions: Dict[int, Session] = {}
+        self._sessions_by_user: Dict[str, Set[int]] = defaultdict(set)  # 用户 ID -> 会话 ID 索引
+        # 活动会话 ID 索引：不可变快照，变更时整体替换，读取方无需复制或加锁
+        self._active_session_ids: FrozenSet[int] = frozenset()
+        self._total_messages: int = 0  # 所有会话的消息总数
+        self._hits: int = 0  # get_session 命中次数
+        self._misses: int = 0  # get_session 未命中次数
+        # 只串行化会话表的结构性修改（注册、注销、关闭）；读取方法均为同步方法，
+        # 执行期间不会让出事件循环，因此不获取此锁即可读到一致的会话表，读与读、读与写互不阻塞
         self._session_lock = asyncio.Lock()
         self._cleanup_task: Optional[asyncio.Task] = None
         self._timeout_duration: float = 3600.0  # 默认超时时间（秒）
 
+        # 会话过期队列：(截止时间, 会话 ID) 小顶堆，每个会话只保留一个有效条目，
+        # 有效条目的时间记录在 _scheduled 中；截止时间推后时不入堆，到期弹出时再按新截止时间重新入堆
+        self._expiry_heap: List[Tuple[float, int]] = []
+        self._scheduled: Dict[int, float] = {}
+        self._expiry_changed: Optional[asyncio.Event] = None
+
     async def initialize(self, timeout_duration: float = 3600.0) -> None:
         """
         初始化会话管理器
@@ -219,9 +262,15 @@ class ConversationManager:
 
         self._timeout_duration = timeout_duration
 
-        # 从数据库加载已有的会话
+        # 从数据库加载已有的会话，并一次性统计各会话的消息数量、预加载最近的消息
         conversations = await DatabaseService.get_active_conversations()
+        conversation_ids = [conversation.id for conversation in conversations]
+        message_counts = await DatabaseService.count_messages_by_conversation(conversation_ids)
+        recent_messages = await DatabaseService.get_recent_messages_by_conversations(
+            conversation_ids, MESSAGE_WINDOW_SIZE
+        )
 
+        active_ids: List[int] = []
         for conversation in conversations:
             session = Session(
                 session_id=conversation.id,
@@ -234,43 +283,147 @@ class ConversationManager:
             session.created_at = conversation.created_at
             session.updated_at = conversation.updated_at
             session.completed_at = conversation.completed_at
+            session._message_count = message_counts.get(conversation.id, 0)
+            session._messages.extend(recent_messages.get(conversation.id, ()))
 
-            self._sessions[conversation.id] = session
+            self._register_session(session, index_active=False)
+            if session.is_active:
+                active_ids.append(session.session_id)
 
-            # 为活动会话设置超时
+            # 为活动会话设置超时，加入随机抖动，避免同时加载的会话在同一时刻集中超时
             if session.is_active:
-                await session.set_timeout(self._timeout_duration)
+                session.set_timeout(self._timeout_duration * (1 + random.uniform(-0.05, 0.05)))
+
+        # 活动索引一次性构建，避免逐个替换快照
+        self._active_session_ids = self._active_session_ids.union(active_ids)
 
         logger.info(f"会话管理器已初始化，加载了 {len(self._sessions)} 个会话")
 
-        # 启动定期清理任务
-        self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
+        # 启动过期清理任务
+        self._cleanup_task = asyncio.create_task(self._expiry_loop())
+
+    def _register_session(self, session: Session, index_active: bool = True) -> None:
+        """
+        将会话加入管理器及各项索引
+
+        Args:
+            session: 会话实例
+            index_active: 是否将活动会话加入活动索引，批量注册时由调用方统一构建
+        """
+        session_id = session.session_id
+        self._sessions[session_id] = session
+        self._sessions_by_user[session.user_id].add(session_id)
+        if index_active and session.is_active:
+            self._active_session_ids = self._active_session_ids | {session_id}
+        self._total_messages += session.message_count
+        session._owner = self
+
+    def _unregister_session(self, session_id: int) -> Optional[Session]:
+        """
+        将会话从管理器及各项索引中移除
+
+        Args:
+            session_id: 会话 ID
+
+        Returns:
+            Optional[Session]: 被移除的会话实例
+        """
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return None
+
+        self._scheduled.pop(session_id, None)
+        if session_id in self._active_session_ids:
+            self._active_session_ids = self._active_session_ids - {session_id}
+        self._total_messages -= session.message_count
+        user_sessions = self._sessions_by_user.get(session.user_id)
+        if user_sessions is not None:
+            user_sessions.discard(session_id)
+            if not user_sessions:
+                del self._sessions_by_user[session.user_id]
+        return session
+
+    def _mark_inactive(self, session_id: int) -> None:
+        """
+        会话结束时将其移出活动索引，并作废其过期队列条目
+
+        条目留在堆中，到期弹出时因不在 _scheduled 中而直接跳过，无需取消任何任务。
+
+        Args:
+            session_id: 会话 ID
+        """
+        if session_id in self._active_session_ids:
+            self._active_session_ids = self._active_session_ids - {session_id}
+        self._scheduled.pop(session_id, None)
+
+    def _schedule_expiry(self, session: Session) -> None:
+        """
+        会话截止时间变化时更新过期队列
+
+        Args:
+            session: 会话实例
+        """
+        session_id = session.session_id
+        deadline = session._deadline
+
+        # 已有更早的条目时无需入堆，该条目到期时会按最新截止时间重新入堆
+        scheduled = self._scheduled.get(session_id)
+        if scheduled is not None and scheduled <= deadline:
+            return
+
+        self._scheduled[session_id] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, session_id))
+
+        # 新条目成为队首时唤醒清理任务，重新计算等待时间
+        if self._expiry_heap[0] == (deadline, session_id) and self._expiry_changed is not None:
+            self._expiry_changed.set()
+
+    async def _expiry_loop(self) -> None:
+        """按过期时间顺序清理超时的会话，只在队首会话到期时唤醒"""
+        self._expiry_changed = asyncio.Event()
 
-    async def _periodic_cleanup(self) -> None:
-        """定期清理超时的会话"""
         while True:
             try:
-                await asyncio.sleep(300)  # 每 5 分钟检查一次
-
-                current_time = datetime.utcnow()
-                expired_sessions: List[int] = []
-
-                async with self._session_lock:
-                    for session_id, session in self._sessions.items():
-                        if session.is_active:
-                            # 检查会话是否超时
-                            time_since_update = (current_time - session.updated_at).total_seconds()
-                            if time_since_update > self._timeout_duration:
-                                expired_sessions.append(session_id)
-
-                # 清理超时的会话
-                for session_id in expired_sessions:
-                    await self.complete_session(session_id)
+                self._expiry_changed.clear()
+
+                if not self._expiry_heap:
+                    await self._expiry_changed.wait()
+                    continue
+
+                expires_at, session_id = self._expiry_heap[0]
+                delay = expires_at - time.monotonic()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._expiry_changed.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                heapq.heappop(self._expiry_heap)
+
+                # 已被更早的条目取代的作废条目
+                if self._scheduled.get(session_id) != expires_at:
+                    continue
+
+                session = self._sessions.get(session_id)
+                if session is None or not session.is_active:
+                    del self._scheduled[session_id]
+                    continue
+
+                # 截止时间已被推后，按新的截止时间重新入堆
+                if session._deadline > expires_at:
+                    self._scheduled[session_id] = session._deadline
+                    heapq.heappush(self._expiry_heap, (session._deadline, session_id))
+                    continue
+
+                del self._scheduled[session_id]
+                if await self.complete_session(session_id):
                     logger.info(f"会话已超时并自动完成: {session_id}")
 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"定期清理任务出错: {e}")
-                continue
+                logger.error(f"会话过期清理任务出错: {e}")
 
     async def create_session(
         self,
@@ -291,34 +444,34 @@ class ConversationManager:
         Returns:
             Session: 会话实例
         """
-        async with self._session_lock:
-            # 在数据库中创建会话
-            conversation = Conversation(
-                user_id=user_id,
-                agent_id=agent_id,
-                title=title,
-                metadata_=metadata,
-            )
-            conversation = await DatabaseService.create_conversation(conversation)
+        # 在数据库中创建会话
+        conversation = Conversation(
+            user_id=user_id,
+            agent_id=agent_id,
+            title=title,
+            metadata_=metadata,
+        )
+        conversation = await DatabaseService.create_conversation(conversation)
+
+        # 创建会话实例
+        session = Session(
+            session_id=conversation.id,
+            user_id=user_id,
+            agent_id=agent_id,
+            title=title,
+            metadata=metadata,
+        )
 
-            # 创建会话实例
-            session = Session(
-                session_id=conversation.id,
-                user_id=user_id,
-                agent_id=agent_id,
-                title=title,
-                metadata=metadata,
-            )
-
-            self._sessions[conversation.id] = session
+        async with self._session_lock:
+            self._register_session(session)
 
-            # 设置超时
-            await session.set_timeout(self._timeout_duration)
+        # 设置超时
+        session.set_timeout(self._timeout_duration)
 
-            logger.info(f"会话已创建: {session.session_id}, 用户: {user_id}")
-            return session
+        logger.info(f"会话已创建: {session.session_id}, 用户: {user_id}")
+        return session
 
-    async def get_session(self, session_id: int) -> Optional[Session]:
+    def get_session(self, session_id: int) -> Optional[Session]:
         """
         获取会话实例
 
@@ -328,10 +481,14 @@ class ConversationManager:
         Returns:
             Optional[Session]: 会话实例
         """
-        async with self._session_lock:
-            return self._sessions.get(session_id)
-
-    async def get_sessions_by_user(self, user_id: str) -> List[Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return session
+
+    def get_sessions_by_user(self, user_id: str) -> List[Session]:
         """
         获取用户的所有会话
 
@@ -341,21 +498,21 @@ class ConversationManager:
         Returns:
             List[Session]: 会话列表
         """
-        async with self._session_lock:
-            return [
-                session for session in self._sessions.values()
-                if session.user_id == user_id
-            ]
+        sessions = self._sessions
+        return [
+            sessions[session_id] for session_id in tuple(self._sessions_by_user.get(user_id, ()))
+            if session_id in sessions
+        ]
 
-    async def get_active_sessions(self) -> List[Session]:
+    def get_active_sessions(self) -> List[Session]:
         """获取所有活动的会话"""
-        async with self._session_lock:
-            return [
-                session for session in self._sessions.values()
-                if session.is_active
-            ]
+        sessions = self._sessions
+        return [
+            sessions[session_id] for session_id in self._active_session_ids
+            if session_id in sessions
+        ]
 
-    async def complete_session(self, session_id: int) -> bool:
+    async def complete_session(self, session_id: int) -> Optional[Session]:
         """
         完成会话
 
@@ -363,18 +520,18 @@ class ConversationManager:
             session_id: 会话 ID
 
         Returns:
-            bool: 是否成功完成
+            Optional[Session]: 完成后的会话实例，会话不存在或已结束时返回 None
         """
-        async with self._session_lock:
-            session = self._sessions.get(session_id)
-            if not session or not session.is_active:
-                return False
+        session = self._sessions.get(session_id)
+        if not session or not session.is_active:
+            return None
 
-            await session.complete()
-            logger.debug(f"会话已完成: {session_id}")
-            return True
+        # 会话自身的锁负责串行化状态变更，无需持有管理器锁
+        await session.complete()
+        logger.debug(f"会话已完成: {session_id}")
+        return session
 
-    async def cancel_session(self, session_id: int) -> bool:
+    async def cancel_session(self, session_id: int) -> Optional[Session]:
         """
         取消会话
 
@@ -382,16 +539,16 @@ class ConversationManager:
             session_id: 会话 ID
 
         Returns:
-            bool: 是否成功取消
+            Optional[Session]: 取消后的会话实例，会话不存在或已结束时返回 None
         """
-        async with self._session_lock:
-            session = self._sessions.get(session_id)
-            if not session or not session.is_active:
-                return False
+        session = self._sessions.get(session_id)
+        if not session or not session.is_active:
+            return None
 
-            await session.cancel()
-            logger.debug(f"会话已取消: {session_id}")
-            return True
+        # 会话自身的锁负责串行化状态变更，无需持有管理器锁
+        await session.cancel()
+        logger.debug(f"会话已取消: {session_id}")
+        return session
 
     async def delete_session(self, session_id: int) -> bool:
         """
@@ -404,19 +561,18 @@ class ConversationManager:
             bool: 是否成功删除
         """
         async with self._session_lock:
-            session = self._sessions.get(session_id)
-            if not session:
-                return False
+            session = self._unregister_session(session_id)
+        if not session:
+            return False
 
-            # 清理资源
-            await session.cleanup()
+        # 清理资源
+        await session.cleanup()
 
-            # 删除从内存和数据库
-            del self._sessions[session_id]
-            await DatabaseService.delete_conversation(session_id)
+        # 从数据库删除
+        await DatabaseService.delete_conversation(session_id)
 
-            logger.info(f"会话已删除: {session_id}")
-            return True
+        logger.info(f"会话已删除: {session_id}")
+        return True
 
     async def add_message_to_session(
         self,
@@ -437,18 +593,18 @@ class ConversationManager:
         Returns:
             Optional[Message]: 消息实例
         """
-        async with self._session_lock:
-            session = self._sessions.get(session_id)
-            if not session or not session.is_active:
-                logger.error(f"会话不可用: {session_id}")
-                return None
+        session = self._sessions.get(session_id)
+        if not session or not session.is_active:
+            logger.error(f"会话不可用: {session_id}")
+            return None
 
-            message = await session.add_message(role, content, metadata)
+        # Session.add_message 持有会话自身的锁，不同会话的消息写入可并发进行
+        message = await session.add_message(role, content, metadata)
 
-            # 重置超时
-            await session.set_timeout(self._timeout_duration)
+        # 重置超时（只更新截止时间，不创建任务）
+        session.set_timeout(self._timeout_duration)
 
-            return message
+        return message
 
     async def get_session_messages(self, session_id: int) -> List[Message]:
         """
@@ -460,14 +616,13 @@ class ConversationManager:
         Returns:
             List[Message]: 消息列表
         """
-        async with self._session_lock:
-            session = self._sessions.get(session_id)
-            if not session:
-                return []
+        session = self._sessions.get(session_id)
+        if not session:
+            return []
 
-            return await session.get_messages()
+        return await session.get_messages()
 
-    async def update_session_title(self, session_id: int, title: str) -> bool:
+    async def update_session_title(self, session_id: int, title: str) -> Optional[Session]:
         """
         更新会话标题
 
@@ -476,21 +631,21 @@ class ConversationManager:
             title: 新标题
 
         Returns:
-            bool: 是否成功更新
+            Optional[Session]: 更新后的会话实例，会话不存在时返回 None
         """
-        async with self._session_lock:
-            session = self._sessions.get(session_id)
-            if not session:
-                return False
+        session = self._sessions.get(session_id)
+        if not session:
+            return None
 
-            session.title = title
-            session.updated_at = datetime.utcnow()
+        # 内存状态的修改不含 await，无需加锁；数据库写入不持有任何锁
+        session.title = title
+        session._touch()
 
-            await DatabaseService.update_conversation(session_id, title=title)
-            logger.debug(f"会话标题已更新: {session_id}, 新标题: {title}")
-            return True
+        await DatabaseService.update_conversation(session_id, title=title)
+        logger.debug(f"会话标题已更新: {session_id}, 新标题: {title}")
+        return session
 
-    async def update_session_metadata(self, session_id: int, metadata: Dict[str, Any]) -> bool:
+    async def update_session_metadata(self, session_id: int, metadata: Dict[str, Any]) -> Optional[Session]:
         """
         更新会话元数据
 
@@ -499,34 +654,46 @@ class ConversationManager:
             metadata: 新元数据
 
         Returns:
-            bool: 是否成功更新
+            Optional[Session]: 更新后的会话实例，会话不存在时返回 None
         """
-        async with self._session_lock:
-            session = self._sessions.get(session_id)
-            if not session:
-                return False
+        session = self._sessions.get(session_id)
+        if not session:
+            return None
 
-            session.metadata.update(metadata)
-            session.updated_at = datetime.utcnow()
+        session.metadata.update(metadata)
+        session._touch()
 
-            await DatabaseService.update_conversation(session_id, metadata=metadata)
-            logger.debug(f"会话元数据已更新: {session_id}")
-            return True
+        # 写入合并后的完整元数据快照，而不只是本次更新的键
+        await DatabaseService.update_conversation(session_id, metadata=dict(session.metadata))
+        logger.debug(f"会话元数据已更新: {session_id}")
+        return session
 
-    async def health_check(self) -> Dict[str, Any]:
+    async def flush(self) -> None:
+        """
+        将缓冲区中尚未写入的消息立即写入数据库
+
+        Raises:
+            MessageWriteError: 有消息未能写入
+        """
+        await message_write_buffer.flush()
+
+    def health_check(self) -> Dict[str, Any]:
         """健康检查"""
-        async with self._session_lock:
-            total_sessions = len(self._sessions)
-            active_sessions = len([s for s in self._sessions.values() if s.is_active])
-            total_messages = sum(s.message_count for s in self._sessions.values())
-
-            return {
-                "total_sessions": total_sessions,
-                "active_sessions": active_sessions,
-                "total_messages": total_messages,
-                "status": "healthy" if active_sessions >= 0 else "warning",
-                "timestamp": datetime.utcnow().isoformat(),
-            }
+        total_sessions = len(self._sessions)
+        active_sessions = len(self._active_session_ids)
+        total_messages = self._total_messages
+        lookups = self._hits + self._misses
+
+        return {
+            "total_sessions": total_sessions,
+            "active_sessions": active_sessions,
+            "total_messages": total_messages,
+            "session_hits": self._hits,
+            "session_misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "status": "healthy" if active_sessions >= 0 else "warning",
+            "timestamp": datetime.utcnow().isoformat(),
+        }
 
     async def shutdown(self) -> None:
         """关闭会话管理器"""
@@ -541,24 +708,43 @@ class ConversationManager:
                 await session.cleanup()
 
         self._sessions.clear()
+        self._sessions_by_user.clear()
+        self._active_session_ids = frozenset()
+        self._total_messages = 0
+        self._expiry_heap.clear()
+        self._scheduled.clear()
+
+        # 写入缓冲区中剩余的消息
+        try:
+            await self.flush()
+        except MessageWriteError as e:
+            logger.error(f"关闭时写入剩余消息失败: {e}")
         logger.info("会话管理器已关闭")
 
 
 # 创建全局会话管理器实例
 _conversation_manager = None
+_init_lock = asyncio.Lock()
 
 
 async def get_conversation_manager() -> ConversationManager:
     """
     获取全局会话管理器实例
 
+    首次调用时在锁内完成初始化，并发调用只会初始化一次；初始化完成后才对外可见。
+
     Returns:
         ConversationManager: 会话管理器实例
     """
     global _conversation_manager
 
-    if _conversation_manager is None:
-        _conversation_manager = ConversationManager()
-        await _conversation_manager.initialize()
+    if _conversation_manager is not None:
+        return _conversation_manager
+
+    async with _init_lock:
+        if _conversation_manager is None:
+            manager = ConversationManager()
+            await manager.initialize()
+            _conversation_manager = manager
 
     return _conversation_manager
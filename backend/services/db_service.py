@@ -3,20 +3,60 @@
 提供便捷的数据库操作方法
 """
 
-from typing import List, Optional
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import delete, func, inspect, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from database import get_db_session
+from database import engine, use_db_session
 from models.agent import Agent, AgentType, AgentStatus
 from models.conversation import Conversation, ConversationStatus
 from models.message import Message, MessageRole
 
+logger = logging.getLogger(__name__)
+
+
+def _update_values(model, values: dict) -> dict:
+    """
+    将更新参数映射为模型的列属性
+
+    同时接受属性名（如 ``metadata_``）和列名（如 ``metadata``），
+    未知的键会被忽略，与逐个 ``setattr`` 时 ``hasattr`` 过滤的行为一致。
+    """
+    columns = {}
+    for attr in inspect(model).column_attrs:
+        columns[attr.key] = attr.class_attribute
+        for column in attr.columns:
+            columns.setdefault(column.key, attr.class_attribute)
+    return {columns[key]: value for key, value in values.items() if key in columns}
+
+
+async def _yield() -> None:
+    """让出事件循环控制权；sleep(0) 只是重新调度当前任务，不会创建定时器"""
+    await asyncio.sleep(0)
+
 
 class DatabaseService:
     """数据库操作服务类"""
 
+    @classmethod
+    async def warmup(cls) -> None:
+        """
+        预热数据库连接池：同时打开连接池容量数量的连接，并各执行一次简单查询
+        连接与创建它的事件循环绑定，须在随后使用连接池的事件循环中调用
+        """
+        size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+
+        async def _ping() -> None:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        await asyncio.gather(*(_ping() for _ in range(size)))
+
     @classmethod
     async def create_agent(
         cls,
@@ -27,68 +67,67 @@ class DatabaseService:
         status: AgentStatus = AgentStatus.ACTIVE,
     ) -> Agent:
         """创建智能体"""
-        async for session in get_db_session():
-            try:
-                agent = Agent(
-                    name=name,
-                    type=type,
-                    description=description,
-                    config=config,
-                    status=status,
-                )
-                session.add(agent)
-                await session.commit()
-                await session.refresh(agent)
-                return agent
-            except Exception as e:
-                await session.rollback()
-                raise e
+        async with use_db_session() as session:
+            agent = Agent(
+                name=name,
+                type=type,
+                description=description,
+                config=config,
+                status=status,
+            )
+            session.add(agent)
+            # flush 时即填充主键与 Python 端默认值，无需再 refresh
+            await session.flush()
+            return agent
 
     @classmethod
     async def get_agent(cls, agent_id: int) -> Optional[Agent]:
         """根据 ID 获取智能体"""
-        async for session in get_db_session():
+        async with use_db_session() as session:
             result = await session.execute(select(Agent).where(Agent.id == agent_id))
             return result.scalar_one_or_none()
 
+    @classmethod
+    async def get_agents_by_ids(cls, agent_ids: List[int]) -> List[Agent]:
+        """根据 ID 列表批量获取智能体（单次 IN 查询）"""
+        if not agent_ids:
+            return []
+        async with use_db_session() as session:
+            result = await session.execute(select(Agent).where(Agent.id.in_(agent_ids)))
+            return list(result.scalars().all())
+
     @classmethod
     async def get_all_agents(cls) -> List[Agent]:
         """获取所有智能体"""
-        async for session in get_db_session():
+        async with use_db_session() as session:
             result = await session.execute(select(Agent))
             return list(result.scalars().all())
 
     @classmethod
     async def update_agent(cls, agent_id: int, **kwargs) -> Optional[Agent]:
         """更新智能体"""
-        async for session in get_db_session():
-            try:
-                agent = await session.get(Agent, agent_id)
-                if agent:
-                    for key, value in kwargs.items():
-                        if hasattr(agent, key):
-                            setattr(agent, key, value)
-                    await session.commit()
-                    await session.refresh(agent)
-                return agent
-            except Exception as e:
-                await session.rollback()
-                raise e
+        values = _update_values(Agent, kwargs)
+        async with use_db_session() as session:
+            if not values:
+                return await session.get(Agent, agent_id)
+            # 单条 UPDATE ... RETURNING，无需先 SELECT 再逐字段赋值
+            result = await session.scalars(
+                update(Agent).where(Agent.id == agent_id).values(values).returning(Agent)
+            )
+            return result.one_or_none()
 
     @classmethod
     async def delete_agent(cls, agent_id: int) -> bool:
         """删除智能体"""
-        async for session in get_db_session():
-            try:
-                agent = await session.get(Agent, agent_id)
-                if agent:
-                    await session.delete(agent)
-                    await session.commit()
-                    return True
-                return False
-            except Exception as e:
-                await session.rollback()
-                raise e
+        async with use_db_session() as session:
+            # 与 ORM 删除时的行为一致：解除关联会话对该智能体的引用
+            await session.execute(
+                update(Conversation)
+                .where(Conversation.agent_id == agent_id)
+                .values(agent_id=None)
+            )
+            result = await session.execute(delete(Agent).where(Agent.id == agent_id))
+            return result.rowcount > 0
 
     @classmethod
     async def create_conversation(
@@ -101,28 +140,23 @@ class DatabaseService:
         metadata: dict = None,
     ) -> Conversation:
         """创建会话"""
-        async for session in get_db_session():
-            try:
-                if conversation is None:
-                    conversation = Conversation(
-                        user_id=user_id,
-                        agent_id=agent_id,
-                        title=title,
-                        status=status,
-                        metadata_=metadata,
-                    )
-                session.add(conversation)
-                await session.commit()
-                await session.refresh(conversation)
-                return conversation
-            except Exception as e:
-                await session.rollback()
-                raise e
+        async with use_db_session() as session:
+            if conversation is None:
+                conversation = Conversation(
+                    user_id=user_id,
+                    agent_id=agent_id,
+                    title=title,
+                    status=status,
+                    metadata_=metadata,
+                )
+            session.add(conversation)
+            await session.flush()
+            return conversation
 
     @classmethod
     async def get_active_conversations(cls) -> List[Conversation]:
         """获取所有活动状态的会话"""
-        async for session in get_db_session():
+        async with use_db_session() as session:
             result = await session.execute(
                 select(Conversation).where(Conversation.status == ConversationStatus.ACTIVE)
             )
@@ -131,7 +165,7 @@ class DatabaseService:
     @classmethod
     async def get_conversation(cls, conversation_id: int) -> Optional[Conversation]:
         """根据 ID 获取会话"""
-        async for session in get_db_session():
+        async with use_db_session() as session:
             result = await session.execute(
                 select(Conversation).where(Conversation.id == conversation_id)
             )
@@ -140,7 +174,7 @@ class DatabaseService:
     @classmethod
     async def get_conversations_by_user(cls, user_id: str) -> List[Conversation]:
         """根据用户 ID 获取会话列表"""
-        async for session in get_db_session():
+        async with use_db_session() as session:
             result = await session.execute(
                 select(Conversation).where(Conversation.user_id == user_id)
             )
@@ -151,34 +185,32 @@ class DatabaseService:
         cls, conversation_id: int, **kwargs
     ) -> Optional[Conversation]:
         """更新会话"""
-        async for session in get_db_session():
-            try:
-                conversation = await session.get(Conversation, conversation_id)
-                if conversation:
-                    for key, value in kwargs.items():
-                        if hasattr(conversation, key):
-                            setattr(conversation, key, value)
-                    await session.commit()
-                    await session.refresh(conversation)
-                return conversation
-            except Exception as e:
-                await session.rollback()
-                raise e
+        values = _update_values(Conversation, kwargs)
+        async with use_db_session() as session:
+            if not values:
+                return await session.get(Conversation, conversation_id)
+            result = await session.scalars(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(values)
+                .returning(Conversation)
+            )
+            return result.one_or_none()
 
     @classmethod
     async def delete_conversation(cls, conversation_id: int) -> bool:
         """删除会话"""
-        async for session in get_db_session():
-            try:
-                conversation = await session.get(Conversation, conversation_id)
-                if conversation:
-                    await session.delete(conversation)
-                    await session.commit()
-                    return True
-                return False
-            except Exception as e:
-                await session.rollback()
-                raise e
+        # 先写入该会话尚未落库的消息，使其随会话一并删除
+        await message_write_buffer.flush()
+        async with use_db_session() as session:
+            # 批量 DELETE 不经过 ORM 级联，需显式删除该会话的消息
+            await session.execute(
+                delete(Message).where(Message.conversation_id == conversation_id)
+            )
+            result = await session.execute(
+                delete(Conversation).where(Conversation.id == conversation_id)
+            )
+            return result.rowcount > 0
 
     @classmethod
     async def create_message(
@@ -190,27 +222,30 @@ class DatabaseService:
         metadata: dict = None,
     ) -> Message:
         """创建消息"""
-        async for session in get_db_session():
-            try:
-                if message is None:
-                    message = Message(
-                        conversation_id=conversation_id,
-                        role=role,
-                        content=content,
-                        metadata_=metadata,
-                    )
-                session.add(message)
-                await session.commit()
-                await session.refresh(message)
-                return message
-            except Exception as e:
-                await session.rollback()
-                raise e
+        async with use_db_session() as session:
+            if message is None:
+                message = Message(
+                    conversation_id=conversation_id,
+                    role=role,
+                    content=content,
+                    metadata_=metadata,
+                )
+            session.add(message)
+            await session.flush()
+            return message
+
+    @classmethod
+    async def create_messages(cls, messages: List[Message]) -> List[Message]:
+        """批量创建消息（单次提交）"""
+        # 后台写入不参与请求级事务，始终使用独立会话提交
+        async with use_db_session(isolated=True) as session:
+            session.add_all(messages)
+            return messages
 
     @classmethod
     async def get_message(cls, message_id: int) -> Optional[Message]:
         """根据 ID 获取消息"""
-        async for session in get_db_session():
+        async with use_db_session() as session:
             result = await session.execute(select(Message).where(Message.id == message_id))
             return result.scalar_one_or_none()
 
@@ -219,7 +254,9 @@ class DatabaseService:
         cls, conversation_id: int
     ) -> List[Message]:
         """根据会话 ID 获取消息列表"""
-        async for session in get_db_session():
+        # 先写入缓冲区中尚未落库的消息，保证读到最新数据
+        await message_write_buffer.flush()
+        async with use_db_session() as session:
             result = await session.execute(
                 select(Message)
                 .where(Message.conversation_id == conversation_id)
@@ -227,17 +264,280 @@ class DatabaseService:
             )
             return list(result.scalars().all())
 
+    @classmethod
+    async def iter_messages_by_conversation(
+        cls, conversation_id: int, batch_size: int = 128
+    ) -> AsyncIterator[Message]:
+        """
+        按时间顺序流式读取会话的消息
+
+        以 batch_size 条为一批从游标读取，内存占用与消息总数无关。
+
+        Args:
+            conversation_id: 会话 ID
+            batch_size: 每批读取的消息数量
+
+        Yields:
+            Message: 消息实例
+        """
+        await message_write_buffer.flush()
+        async with use_db_session() as session:
+            result = await session.stream_scalars(
+                select(Message)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at, Message.id)
+                .execution_options(yield_per=batch_size)
+            )
+            async for message in result:
+                yield message
+
+    @classmethod
+    async def get_recent_messages(cls, conversation_id: int, limit: int) -> List[Message]:
+        """获取会话最近的 limit 条消息（按时间正序）"""
+        # 先写入缓冲区中尚未落库的消息，保证读到最新数据
+        await message_write_buffer.flush()
+        async with use_db_session() as session:
+            result = await session.execute(
+                select(Message)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at.desc(), Message.id.desc())
+                .limit(limit)
+            )
+            messages = list(result.scalars().all())
+            messages.reverse()
+            return messages
+
+    @classmethod
+    async def get_recent_messages_by_conversations(
+        cls, conversation_ids: List[int], limit: int
+    ) -> Dict[int, List[Message]]:
+        """获取多个会话各自最近的 limit 条消息（单次窗口函数查询，按时间正序）"""
+        if not conversation_ids:
+            return {}
+        await message_write_buffer.flush()
+        async with use_db_session() as session:
+            row_number = (
+                func.row_number()
+                .over(
+                    partition_by=Message.conversation_id,
+                    order_by=(Message.created_at.desc(), Message.id.desc()),
+                )
+                .label("row_number")
+            )
+            ranked = (
+                select(Message, row_number)
+                .where(Message.conversation_id.in_(conversation_ids))
+                .subquery()
+            )
+            recent = aliased(Message, ranked)
+            result = await session.execute(
+                select(recent)
+                .where(ranked.c.row_number <= limit)
+                .order_by(recent.conversation_id, recent.created_at, recent.id)
+            )
+            messages_by_conversation: Dict[int, List[Message]] = {}
+            for message in result.scalars():
+                messages_by_conversation.setdefault(message.conversation_id, []).append(message)
+            return messages_by_conversation
+
+    @classmethod
+    async def count_messages_by_conversation(cls, conversation_ids: List[int]) -> Dict[int, int]:
+        """统计多个会话的消息数量（单次 GROUP BY 查询）"""
+        if not conversation_ids:
+            return {}
+        async with use_db_session() as session:
+            result = await session.execute(
+                select(Message.conversation_id, func.count(Message.id))
+                .where(Message.conversation_id.in_(conversation_ids))
+                .group_by(Message.conversation_id)
+            )
+            return {conversation_id: count for conversation_id, count in result.all()}
+
     @classmethod
     async def delete_message(cls, message_id: int) -> bool:
         """删除消息"""
-        async for session in get_db_session():
+        async with use_db_session() as session:
+            result = await session.execute(delete(Message).where(Message.id == message_id))
+            return result.rowcount > 0
+
+
+class MessageWriteError(Exception):
+    """消息写入数据库失败"""
+
+    def __init__(self, messages: List[Message], requeued: int, cause: Exception):
+        """
+        Args:
+            messages: 本次未能写入的消息
+            requeued: 其中已放回缓冲区等待重试的消息数量，其余消息已超过重试次数被丢弃
+            cause: 最后一次写入的异常
+        """
+        super().__init__(
+            f"{len(messages)} 条消息写入失败（{requeued} 条等待重试，"
+            f"{len(messages) - requeued} 条已丢弃）: {cause}"
+        )
+        self.messages = messages
+        self.requeued = requeued
+        self.cause = cause
+
+
+class MessageWriteBuffer:
+    """
+    消息批量写入缓冲区
+    消息先进入缓冲区，数量达到 max_batch 或最早的消息等待超过 max_age_ms 时合并为一次提交写入数据库
+
+    批次写入失败时按指数退避重试；仍然失败则逐条写入，定位出写入失败的消息。
+    写入失败的消息放回缓冲区等待下一次写入，累计失败 max_failures 次后才丢弃；
+    两种情况都会以 MessageWriteError 通知等待 flush 的调用方。
+    """
+
+    def __init__(
+        self,
+        max_batch: int = 64,
+        max_age_ms: int = 100,
+        max_retries: int = 3,
+        retry_delay_ms: int = 50,
+        max_failures: int = 5,
+    ):
+        """
+        初始化写入缓冲区
+
+        Args:
+            max_batch: 单批最大消息数，达到后立即写入
+            max_age_ms: 消息在缓冲区中的最长等待时间（毫秒）
+            max_retries: 单批写入的最大尝试次数
+            retry_delay_ms: 首次重试前的等待时间（毫秒），之后每次翻倍
+            max_failures: 单条消息累计写入失败多少次后丢弃
+        """
+        self.max_batch = max_batch
+        self.max_age = max_age_ms / 1000
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay_ms / 1000
+        self.max_failures = max_failures
+        self._pending: List[Message] = []
+        self._failures: Dict[int, int] = {}  # id(消息) -> 累计失败次数
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None  # 缓冲区满时触发的后台写入，同一时刻至多一个
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending_count(self) -> int:
+        """获取待写入的消息数量"""
+        return len(self._pending)
+
+    def add(self, message: Message) -> None:
+        """
+        将消息加入缓冲区
+
+        Args:
+            message: 消息实例
+        """
+        self._pending.append(message)
+
+        if len(self._pending) >= self.max_batch:
+            # 进行中的写入会继续取走其间新加入的消息，无需再排队一个写入任务
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = self._spawn(self._background_flush())
+        elif self._timer is None or self._timer.done():
+            self._timer = self._spawn(self._flush_after_delay())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """创建后台任务并保留引用，防止任务被回收"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_after_delay(self, delay: Optional[float] = None) -> None:
+        """等待 delay（默认 max_age）后写入"""
+        await asyncio.sleep(self.max_age if delay is None else delay)
+        await self._background_flush()
+
+    async def _background_flush(self) -> None:
+        """后台写入：没有等待者，失败只记录日志；仍有消息等待重试时安排下一次写入"""
+        try:
+            await self.flush()
+        except MessageWriteError as e:
+            logger.error("后台写入消息失败: %s", e)
+            timer = self._timer
+            if self._pending and (timer is None or timer.done() or timer is asyncio.current_task()):
+                self._timer = self._spawn(self._flush_after_delay(self.retry_delay * 2 ** self.max_retries))
+
+    async def _write_batch(self, batch: List[Message]) -> None:
+        """写入一批消息，失败时按指数退避重试，重试耗尽后抛出最后一次的异常"""
+        for attempt in range(self.max_retries):
             try:
-                message = await session.get(Message, message_id)
-                if message:
-                    await session.delete(message)
-                    await session.commit()
-                    return True
-                return False
+                await DatabaseService.create_messages(batch)
+                return
+            except Exception:
+                if attempt + 1 >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+
+    async def _write_each(self, batch: List[Message]) -> Tuple[List[Message], Optional[Exception]]:
+        """逐条写入消息，返回写入失败的消息和最后一次的异常"""
+        failed: List[Message] = []
+        error: Optional[Exception] = None
+        for message in batch:
+            try:
+                await DatabaseService.create_messages([message])
             except Exception as e:
-                await session.rollback()
-                raise e
+                failed.append(message)
+                error = e
+        return failed, error
+
+    async def flush(self) -> None:
+        """
+        立即将缓冲区中的所有消息写入数据库
+
+        Raises:
+            MessageWriteError: 有消息未能写入
+        """
+        async with self._flush_lock:
+            failed: List[Message] = []
+            error: Optional[Exception] = None
+
+            while self._pending:
+                batch = self._pending[: self.max_batch]
+                del self._pending[: self.max_batch]
+                try:
+                    await self._write_batch(batch)
+                    written = batch
+                except Exception as e:
+                    logger.warning("批量写入 %d 条消息失败，改为逐条写入: %s", len(batch), e)
+                    batch_failed, batch_error = await self._write_each(batch)
+                    failed.extend(batch_failed)
+                    error = batch_error or error
+                    failed_ids = {id(message) for message in batch_failed}
+                    written = [message for message in batch if id(message) not in failed_ids]
+
+                for message in written:
+                    self._failures.pop(id(message), None)
+
+                # 批次之间让出事件循环，避免长时间占用
+                if self._pending:
+                    await _yield()
+
+            if not failed:
+                return
+
+            # 写入失败的消息按原顺序放回缓冲区头部，超过失败次数的丢弃
+            requeue: List[Message] = []
+            for message in failed:
+                count = self._failures.get(id(message), 0) + 1
+                if count >= self.max_failures:
+                    self._failures.pop(id(message), None)
+                    logger.error("消息累计写入失败 %d 次，已丢弃: 会话 %s", count, message.conversation_id)
+                else:
+                    self._failures[id(message)] = count
+                    requeue.append(message)
+            self._pending[:0] = requeue
+
+        raise MessageWriteError(failed, len(requeue), error)
+
+
+# 全局消息写入缓冲区（可通过环境变量按部署调整）
+message_write_buffer = MessageWriteBuffer(
+    max_batch=int(os.getenv("MESSAGE_FLUSH_BATCH_SIZE", "64")),
+    max_age_ms=int(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "100")),
+)
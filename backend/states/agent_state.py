@@ -6,20 +6,147 @@
 import asyncio
 import json
 import logging
+import socket
+import threading
+import time
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Union
 
-import redis
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
-from backend.agents.base import AgentState, BaseAgent
-from backend.controllers.agent_controller import get_agent_controller
+# redis 和 aiosqlite 只在对应的存储类型下使用，运行时按需导入，
+# 仅使用内存存储的进程不必承担导入开销
+if TYPE_CHECKING:
+    import aiosqlite
+    import redis.asyncio as aioredis
+
+try:
+    import orjson
+
+    def _json_dumps(data: Any) -> bytes:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+    _json_loads = orjson.loads
+except ImportError:  # orjson 为可选依赖，未安装时使用标准库
+
+    def _json_dumps(data: Any) -> bytes:
+        return json.dumps(data, default=str).encode("utf-8")
+
+    _json_loads = json.loads
+
+from agents.base import AgentState, BaseAgent
+from controllers.agent_controller import get_agent_controller
 from models.agent import Agent, AgentStatus, AgentType
-from backend.services.db_service import DatabaseService
+from services.db_service import DatabaseService
 
 logger = logging.getLogger(__name__)
 
+# Redis 中状态数据的过期时间（秒）
+REDIS_STATE_TTL = 60 * 60 * 24
+
+# Redis 连接池的最大连接数，按并发保存状态的协程数调整
+REDIS_MAX_CONNECTIONS = 32
+
+# Redis 连接的 TCP keepalive 参数（TCP_KEEPIDLE 仅部分平台提供）
+REDIS_KEEPALIVE_OPTIONS = (
+    {socket.TCP_KEEPIDLE: 60} if hasattr(socket, "TCP_KEEPIDLE") else {}
+)
+
+# 磁盘存储使用的 SQLite 数据库文件
+DEFAULT_STATE_DB_PATH = "agent_states.db"
+
+
+@lru_cache(maxsize=None)
+def _state_adapter() -> TypeAdapter:
+    """
+    获取状态数据的 TypeAdapter
+
+    首次使用时创建并复用其序列化器和校验器，直接在 JSON 字节与模型之间转换，不经过中间字典。
+    """
+    return TypeAdapter(AgentStateData)
+
+
+def _encode_state_rows(states: List["AgentStateData"], updated_at: float) -> List[tuple]:
+    """将状态数据编码为磁盘存储的行（在线程池中执行）"""
+    dump_json = _state_adapter().dump_json
+    return [(state_data.agent_id, dump_json(state_data), updated_at) for state_data in states]
+
+
+# Redis 哈希中以 JSON 编码存储的字段，其余字段存储为字符串
+_REDIS_JSON_FIELDS = ("config", "history", "metadata")
+
+
+def _encode_state_hash(state_data: "AgentStateData") -> Dict[str, Any]:
+    """将状态数据编码为 Redis 哈希字段"""
+    return {
+        "agent_id": state_data.agent_id,
+        "name": state_data.name,
+        "type": state_data.type.value,
+        "state": state_data.state.value,
+        "config": _json_dumps(state_data.config),
+        "created_at": state_data.created_at.isoformat(),
+        "updated_at": state_data.updated_at.isoformat(),
+        "history": _json_dumps(state_data.history),
+        "metadata": _json_dumps(state_data.metadata),
+    }
+
+
+def _decode_state_hash(fields: Dict[bytes, bytes]) -> "AgentStateData":
+    """将 Redis 哈希字段解码为状态数据"""
+    data = {}
+    for key, value in fields.items():
+        key = key.decode("utf-8")
+        data[key] = _json_loads(value) if key in _REDIS_JSON_FIELDS else value.decode("utf-8")
+    return AgentStateData.model_validate(data)
+
+
+def _try_decode_state_hash(key: Any, fields: Dict[bytes, bytes]) -> Optional["AgentStateData"]:
+    """解码 Redis 哈希字段，哈希不完整或已损坏时记录日志并返回 None"""
+    try:
+        return _decode_state_hash(fields)
+    except Exception as e:
+        logger.warning(f"跳过无法解码的智能体状态 {key!r}: {e}")
+        return None
+
+
+# 只更新仍存在的状态哈希并重置过期时间：已删除或已过期的键不会被重建为缺字段、无过期时间的哈希。
+# ARGV[1] 为过期秒数，之后按 KEYS 顺序依次为每个键的字段数 n 及 n 组字段名、字段值
+_UPDATE_EXISTING_FIELDS_SCRIPT = """
+local ttl = ARGV[1]
+local i = 2
+for k = 1, #KEYS do
+    local n = tonumber(ARGV[i])
+    if redis.call('EXISTS', KEYS[k]) == 1 then
+        redis.call('HSET', KEYS[k], unpack(ARGV, i + 1, i + 2 * n))
+        redis.call('EXPIRE', KEYS[k], ttl)
+    end
+    i = i + 1 + 2 * n
+end
+return 0
+"""
+
+
+class StateWriteError(Exception):
+    """智能体状态写入 Redis 失败"""
+
+    def __init__(self, states: List["AgentStateData"], requeued: int, cause: Optional[Exception]):
+        """
+        Args:
+            states: 本次未能写入的状态
+            requeued: 其中仍留在写入队列等待重试的状态数量，其余状态已超过失败次数被丢弃
+            cause: 最后一次写入的异常
+        """
+        super().__init__(
+            f"{len(states)} 条智能体状态写入失败（{requeued} 条等待重试，"
+            f"{len(states) - requeued} 条已丢弃）: {cause}"
+        )
+        self.states = states
+        self.requeued = requeued
+        self.cause = cause
+
 
 class StateType(str, Enum):
     """状态类型枚举"""
@@ -32,6 +159,9 @@ class StateType(str, Enum):
 class AgentStateData(BaseModel):
     """智能体状态数据模型"""
 
+    # 推迟到首次使用时再构建校验器，仅导入本模块的进程不承担构建开销
+    model_config = ConfigDict(defer_build=True)
+
     agent_id: int = Field(..., description="智能体 ID")
     name: str = Field(..., description="智能体名称")
     type: AgentType = Field(..., description="智能体类型")
@@ -49,31 +179,137 @@ class AgentStateManager:
     负责智能体状态的存储、加载和管理
     """
 
-    def __init__(self, state_type: StateType = StateType.MEMORY):
+    def __init__(
+        self,
+        state_type: StateType = StateType.MEMORY,
+        write_batch_size: int = 64,
+        write_interval_ms: int = 50,
+        state_db_path: str = DEFAULT_STATE_DB_PATH,
+        write_retries: int = 3,
+        retry_delay_ms: int = 50,
+        max_write_failures: int = 5,
+    ):
         """
         初始化状态管理器
 
         Args:
             state_type: 状态存储类型
+            write_batch_size: Redis 后台写入的单批最大状态数，达到后立即写入
+            write_interval_ms: 状态在写入队列中的最长等待时间（毫秒）
+            state_db_path: 磁盘存储使用的 SQLite 数据库文件路径
+            write_retries: Redis 单批写入的最大尝试次数
+            retry_delay_ms: 首次重试前的等待时间（毫秒），之后每次翻倍
+            max_write_failures: 单个状态累计写入失败多少次后从写入队列中丢弃
         """
         self._state_type: StateType = state_type
+        # 内存存储只在事件循环线程中访问，每次读写都是单个不含 await 的字典操作，无需加锁
         self._memory_states: Dict[int, AgentStateData] = {}
-        self._redis_client: Optional[redis.Redis] = None
+        self._redis_client: Optional["aioredis.Redis"] = None
+
+        # 磁盘存储：所有智能体共用一个 WAL 模式的 SQLite 数据库，首次使用时打开
+        self._state_db_path = state_db_path
+        self._state_db: Optional["aiosqlite.Connection"] = None
+        self._state_db_lock = asyncio.Lock()
+
+        # 状态发生变化、等待与数据库同步的智能体
+        self._dirty: Set[int] = set()
+        self._dirty_event = asyncio.Event()
+
+        # Redis 后台写入队列：同一智能体的多次保存合并为最新一次，按批通过 pipeline 写入
+        self._write_batch_size = write_batch_size
+        self._write_interval = write_interval_ms / 1000
+        self._pending_writes: Dict[int, AgentStateData] = {}
+        # 写入失败的状态留在队列中等待重试，累计失败次数超过上限才丢弃
+        self._write_retries = write_retries
+        self._retry_delay = retry_delay_ms / 1000
+        self._max_write_failures = max_write_failures
+        self._write_failures: Dict[int, int] = {}  # 智能体 ID -> 累计失败次数
+        self._flush_lock = asyncio.Lock()
+        self._flush_timer: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None  # 队列满时触发的后台写入，同一时刻至多一个
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 各存储类型的读写方法，按当前存储类型查表调用（存储类型可能在降级时改变）
+        self._savers = {
+            StateType.MEMORY: self._save_to_memory,
+            StateType.DISK: self._save_to_disk,
+            StateType.REDIS: self._save_to_redis,
+        }
+        self._loaders = {
+            StateType.MEMORY: self._load_from_memory,
+            StateType.DISK: self._load_from_disk,
+            StateType.REDIS: self._load_from_redis,
+        }
+        self._deleters = {
+            StateType.MEMORY: self._delete_from_memory,
+            StateType.DISK: self._delete_from_disk,
+            StateType.REDIS: self._delete_from_redis,
+        }
 
         if state_type == StateType.REDIS:
-            self._init_redis()
+            try:
+                self._redis_client = self._create_redis_client()
+            except (ImportError, AttributeError) as e:
+                # 未安装 redis 或版本过低（需要 redis>=5.0.1，即 metisai-backend[redis]）
+                logger.error(f"无法创建 Redis 客户端: {e}")
+                self._state_type = StateType.MEMORY
+                logger.warning("已降级为内存存储")
+
+    @staticmethod
+    def _create_redis_client() -> "aioredis.Redis":
+        """
+        创建 Redis 客户端
 
-    def _init_redis(self) -> None:
+        Returns:
+            aioredis.Redis: Redis 客户端
         """
-        初始化 Redis 客户端
+        # Redis.from_pool 与 aclose 需要 redis>=5.0.1
+        import redis.asyncio as aioredis
+
+        # 创建客户端不会建立连接，连接在 _init_redis 中验证；
+        # 使用阻塞式连接池，让并发的协程分摊到多个连接上，连接耗尽时排队等待；
+        # 不解码响应，读取到的原始字节直接交给 _json_loads 解析
+        pool = aioredis.BlockingConnectionPool(
+            host="localhost",
+            port=6379,
+            db=0,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_keepalive=True,
+            socket_keepalive_options=REDIS_KEEPALIVE_OPTIONS,
+            health_check_interval=30,
+            decode_responses=False,
+        )
+        # from_pool 使客户端接管连接池，aclose 时一并关闭
+        return aioredis.Redis.from_pool(pool)
+
+    @classmethod
+    async def create(
+        cls, state_type: StateType = StateType.MEMORY, **kwargs: Any
+    ) -> "AgentStateManager":
         """
-        try:
-            self._redis_client = redis.Redis(
-                host="localhost", port=6379, db=0, decode_responses=True
-            )
+        创建状态管理器并验证存储连接
+
+        Redis 不可用时降级为内存存储。
+
+        Args:
+            state_type: 状态存储类型
+            **kwargs: 其余构造参数
+
+        Returns:
+            AgentStateManager: 状态管理器实例
+        """
+        manager = cls(state_type, **kwargs)
+        if manager._state_type == StateType.REDIS:
+            await manager._init_redis()
+        return manager
 
+    async def _init_redis(self) -> None:
+        """
+        验证 Redis 连接
+        """
+        try:
             # 测试连接
-            self._redis_client.ping()
+            await self._redis_client.ping()
             logger.info("Redis 连接成功")
 
         except Exception as e:
@@ -81,18 +317,22 @@ class AgentStateManager:
             self._state_type = StateType.MEMORY
             logger.warning("已降级为内存存储")
 
-    async def save_state(self, agent: BaseAgent) -> bool:
+    async def save_state(self, agent: BaseAgent, wait: bool = False) -> bool:
         """
         保存智能体状态
 
+        Redis 存储默认只将状态加入后台写入队列；wait 为 True 时等待写入 Redis 完成。
+
         Args:
             agent: 智能体实例
+            wait: 是否等待状态写入 Redis
 
         Returns:
             bool: 是否成功保存
         """
         try:
-            state_data = AgentStateData(
+            # 字段来自已校验的智能体实例，跳过重复校验
+            state_data = AgentStateData.model_construct(
                 agent_id=agent.agent_id,
                 name=agent.name,
                 type=agent.type,
@@ -100,19 +340,20 @@ class AgentStateManager:
                 config=agent.config.dict(),
                 created_at=agent.created_at,
                 updated_at=agent.updated_at,
-                history=[h.dict() for h in agent.history],
+                history=agent.serialized_history(),
             )
 
-            if self._state_type == StateType.MEMORY:
-                self._memory_states[agent.agent_id] = state_data
-
-            elif self._state_type == StateType.DISK:
-                await self._save_to_disk(agent.agent_id, state_data)
-
-            elif self._state_type == StateType.REDIS:
-                await self._save_to_redis(agent.agent_id, state_data)
-
-            logger.debug(f"智能体状态已保存: {agent.agent_id}")
+            await self._savers[self._state_type](agent.agent_id, state_data)
+            if wait and self._state_type == StateType.REDIS:
+                try:
+                    await self.flush()
+                except StateWriteError as e:
+                    # 只关心本次保存的状态，队列中其他状态的失败由后台重试处理
+                    if any(failed is state_data for failed in e.states):
+                        raise
+
+            self.mark_dirty(agent.agent_id)
+            logger.debug("智能体状态已保存: %s", agent.agent_id)
             return True
 
         except Exception as e:
@@ -130,20 +371,197 @@ class AgentStateManager:
             Optional[AgentStateData]: 状态数据
         """
         try:
-            if self._state_type == StateType.MEMORY:
-                return self._memory_states.get(agent_id)
-
-            elif self._state_type == StateType.DISK:
-                return await self._load_from_disk(agent_id)
-
-            elif self._state_type == StateType.REDIS:
-                return await self._load_from_redis(agent_id)
-
-            return None
+            return await self._loaders[self._state_type](agent_id)
         except Exception as e:
             logger.error(f"加载智能体状态失败: {e}")
             return None
 
+    async def _save_to_memory(self, agent_id: int, state_data: AgentStateData) -> None:
+        """
+        保存到内存
+
+        Args:
+            agent_id: 智能体 ID
+            state_data: 状态数据
+        """
+        self._memory_states[agent_id] = state_data
+
+    async def _load_from_memory(self, agent_id: int) -> Optional[AgentStateData]:
+        """
+        从内存加载
+
+        Args:
+            agent_id: 智能体 ID
+
+        Returns:
+            Optional[AgentStateData]: 状态数据
+        """
+        return self._memory_states.get(agent_id)
+
+    async def _delete_from_memory(self, agent_id: int) -> None:
+        """
+        从内存删除
+
+        Args:
+            agent_id: 智能体 ID
+        """
+        self._memory_states.pop(agent_id, None)
+
+    def mark_dirty(self, agent_id: int) -> None:
+        """
+        标记智能体状态需要与数据库同步
+
+        Args:
+            agent_id: 智能体 ID
+        """
+        self._dirty.add(agent_id)
+        self._dirty_event.set()
+
+    async def sync_dirty(self) -> int:
+        """
+        等待有状态被标记后，只同步被标记的智能体
+
+        Returns:
+            int: 同步的状态数量
+        """
+        await self._dirty_event.wait()
+        self._dirty_event.clear()
+        dirty, self._dirty = self._dirty, set()
+        return await self.sync_with_db(dirty)
+
+    def _enqueue_write(self, state_data: AgentStateData) -> None:
+        """
+        将状态加入 Redis 后台写入队列
+
+        Args:
+            state_data: 状态数据
+        """
+        self._pending_writes[state_data.agent_id] = state_data
+
+        if len(self._pending_writes) >= self._write_batch_size:
+            # 进行中的写入会继续取走其间新加入的状态，无需再排队一个写入任务
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = self._spawn(self._background_flush())
+        elif self._flush_timer is None or self._flush_timer.done():
+            self._flush_timer = self._spawn(self._flush_after_delay())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """创建后台任务并保留引用，防止任务被回收"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_after_delay(self, delay: Optional[float] = None) -> None:
+        """等待 delay（默认写入间隔）后写入"""
+        await asyncio.sleep(self._write_interval if delay is None else delay)
+        await self._background_flush()
+
+    async def _background_flush(self) -> None:
+        """后台写入：没有等待者，失败只记录日志；仍有状态等待重试时安排下一次写入"""
+        try:
+            await self.flush()
+        except StateWriteError as e:
+            logger.error(f"后台写入智能体状态失败: {e}")
+            timer = self._flush_timer
+            if self._pending_writes and (
+                timer is None or timer.done() or timer is asyncio.current_task()
+            ):
+                self._flush_timer = self._spawn(
+                    self._flush_after_delay(self._retry_delay * 2**self._write_retries)
+                )
+
+    async def _write_batch(self, batch: List[AgentStateData]) -> None:
+        """写入一批状态，失败时按指数退避重试，重试耗尽后抛出最后一次的异常"""
+        for attempt in range(self._write_retries):
+            try:
+                await self._save_many_to_redis(batch)
+                return
+            except Exception:
+                if attempt + 1 >= self._write_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay * 2**attempt)
+
+    async def flush(self) -> None:
+        """
+        立即将写入队列中的所有状态写入 Redis
+
+        Raises:
+            StateWriteError: 有状态未能写入
+        """
+        async with self._flush_lock:
+            pending = self._pending_writes
+            failed: Dict[int, AgentStateData] = {}
+            error: Optional[Exception] = None
+
+            while True:
+                # 本次已写入失败的状态留在队列中，不在同一次 flush 中反复尝试
+                retryable = (
+                    queued for queued in pending.values() if failed.get(queued.agent_id) is not queued
+                )
+                batch = list(islice(retryable, self._write_batch_size))
+                if not batch:
+                    break
+
+                try:
+                    await self._write_batch(batch)
+                except Exception as e:
+                    error = e
+                    for state_data in batch:
+                        failed[state_data.agent_id] = state_data
+                    continue
+
+                # 写入完成后才移出队列，写入期间的读取仍能命中队列；
+                # 写入期间又被保存的新状态保留在队列中，等待下一批写入
+                for state_data in batch:
+                    self._write_failures.pop(state_data.agent_id, None)
+                    if pending.get(state_data.agent_id) is state_data:
+                        del pending[state_data.agent_id]
+
+            if not failed:
+                return
+
+            # 写入失败的状态留在队列中等待重试，超过失败次数的丢弃
+            requeued = 0
+            for agent_id, state_data in failed.items():
+                count = self._write_failures.get(agent_id, 0) + 1
+                if count >= self._max_write_failures:
+                    self._write_failures.pop(agent_id, None)
+                    if pending.get(agent_id) is state_data:
+                        del pending[agent_id]
+                    logger.error(f"智能体状态累计写入失败 {count} 次，已丢弃: {agent_id}")
+                else:
+                    self._write_failures[agent_id] = count
+                    requeued += 1
+
+        raise StateWriteError(list(failed.values()), requeued, error)
+
+    async def _get_state_db(self) -> "aiosqlite.Connection":
+        """
+        获取磁盘存储的数据库连接，首次调用时打开数据库并建表
+
+        Returns:
+            aiosqlite.Connection: 数据库连接
+        """
+        if self._state_db is not None:
+            return self._state_db
+
+        async with self._state_db_lock:
+            if self._state_db is None:
+                import aiosqlite
+
+                db = await aiosqlite.connect(self._state_db_path)
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                await db.execute(
+                    "CREATE TABLE IF NOT EXISTS agent_states ("
+                    "agent_id INTEGER PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+                )
+                await db.commit()
+                self._state_db = db
+
+        return self._state_db
+
     async def _save_to_disk(self, agent_id: int, state_data: AgentStateData) -> None:
         """
         保存到磁盘
@@ -152,10 +570,28 @@ class AgentStateManager:
             agent_id: 智能体 ID
             state_data: 状态数据
         """
-        filename = f"agent_state_{agent_id}.json"
+        await self._save_many_to_disk([state_data])
 
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(state_data.dict(), f, default=str, indent=4)
+    async def _save_many_to_disk(self, states: List[AgentStateData]) -> None:
+        """
+        在一个事务中批量保存到磁盘
+
+        Args:
+            states: 状态数据列表
+        """
+        # 保存时间在编码前确定：编码在线程池中进行，并发保存可能乱序完成，
+        # 写入时只接受不早于已有记录的版本，保证最终保留最新的状态
+        saved_at = time.time()
+        rows = await asyncio.to_thread(_encode_state_rows, states, saved_at)
+
+        db = await self._get_state_db()
+        await db.executemany(
+            "INSERT INTO agent_states (agent_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(agent_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at "
+            "WHERE excluded.updated_at >= agent_states.updated_at",
+            rows,
+        )
+        await db.commit()
 
     async def _load_from_disk(self, agent_id: int) -> Optional[AgentStateData]:
         """
@@ -167,40 +603,74 @@ class AgentStateManager:
         Returns:
             Optional[AgentStateData]: 状态数据
         """
-        filename = f"agent_state_{agent_id}.json"
-
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # 转换日期字符串为 datetime 对象
-            data["created_at"] = datetime.fromisoformat(data["created_at"])
-            data["updated_at"] = datetime.fromisoformat(data["updated_at"])
-
-            return AgentStateData(**data)
-        except FileNotFoundError:
-            logger.debug(f"智能体状态文件未找到: {agent_id}")
-            return None
+            states = await self._load_many_from_disk([agent_id])
+            state_data = states.get(agent_id)
+            if state_data is None:
+                logger.debug("智能体状态未找到: %s", agent_id)
+            return state_data
         except Exception as e:
             logger.error(f"从磁盘加载智能体状态失败: {e}")
             return None
 
+    async def _load_many_from_disk(self, agent_ids: List[int]) -> Dict[int, AgentStateData]:
+        """
+        通过一次查询从磁盘批量加载
+
+        Args:
+            agent_ids: 智能体 ID 列表
+
+        Returns:
+            Dict[int, AgentStateData]: 智能体 ID 到状态数据的映射，不存在的状态不包含在内
+        """
+        db = await self._get_state_db()
+        placeholders = ", ".join("?" * len(agent_ids))
+        async with db.execute(
+            f"SELECT agent_id, data FROM agent_states WHERE agent_id IN ({placeholders})",
+            agent_ids,
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        validate_json = _state_adapter().validate_json
+        return {agent_id: validate_json(data) for agent_id, data in rows}
+
+    async def _delete_from_disk(self, agent_id: int) -> None:
+        """
+        从磁盘删除
+
+        Args:
+            agent_id: 智能体 ID
+        """
+        db = await self._get_state_db()
+        await db.execute("DELETE FROM agent_states WHERE agent_id = ?", (agent_id,))
+        await db.commit()
+
+    async def close(self) -> None:
+        """关闭状态管理器：写入排队中的状态并释放存储连接"""
+        if self._pending_writes:
+            try:
+                await self.flush()
+            except StateWriteError as e:
+                logger.error(f"关闭时写入排队中的智能体状态失败: {e}")
+        if self._state_db is not None:
+            await self._state_db.close()
+            self._state_db = None
+        if self._redis_client is not None:
+            await self._redis_client.aclose()
+
     async def _save_to_redis(self, agent_id: int, state_data: AgentStateData) -> None:
         """
-        保存到 Redis
+        保存到 Redis：加入后台写入队列后立即返回，不等待 Redis 确认
 
         Args:
             agent_id: 智能体 ID
             state_data: 状态数据
         """
-        key = f"agent:{agent_id}"
-        value = state_data.json()
-        self._redis_client.set(key, value)
-        self._redis_client.expire(key, 60 * 60 * 24)
+        self._enqueue_write(state_data)
 
     async def _load_from_redis(self, agent_id: int) -> Optional[AgentStateData]:
         """
-        从 Redis 加载
+        从 Redis 加载，尚未写入的状态以写入队列中的为准
 
         Args:
             agent_id: 智能体 ID
@@ -208,14 +678,137 @@ class AgentStateManager:
         Returns:
             Optional[AgentStateData]: 状态数据
         """
+        pending = self._pending_writes.get(agent_id)
+        if pending is not None:
+            return pending
+
         key = f"agent:{agent_id}"
-        value = self._redis_client.get(key)
+        fields = await self._redis_client.hgetall(key)
 
-        if value:
-            return AgentStateData.parse_raw(value)
+        if fields:
+            return _try_decode_state_hash(key, fields)
         else:
             return None
 
+    async def _delete_from_redis(self, agent_id: int) -> None:
+        """
+        从 Redis 删除
+
+        Args:
+            agent_id: 智能体 ID
+        """
+        # 丢弃排队中的写入，并等待进行中的批次完成，避免删除后被旧状态覆盖
+        self._pending_writes.pop(agent_id, None)
+        self._write_failures.pop(agent_id, None)
+        async with self._flush_lock:
+            pass
+        await self._redis_client.delete(f"agent:{agent_id}")
+
+    async def _load_many_from_redis(self, agent_ids: List[int]) -> Dict[int, AgentStateData]:
+        """
+        通过 pipeline 一次往返从 Redis 批量加载
+
+        Args:
+            agent_ids: 智能体 ID 列表
+
+        Returns:
+            Dict[int, AgentStateData]: 智能体 ID 到状态数据的映射，不存在的状态不包含在内
+        """
+        async with self._redis_client.pipeline(transaction=False) as pipe:
+            for agent_id in agent_ids:
+                pipe.hgetall(f"agent:{agent_id}")
+            values = await pipe.execute()
+
+        states = {}
+        for agent_id, fields in zip(agent_ids, values):
+            if fields:
+                state_data = _try_decode_state_hash(f"agent:{agent_id}", fields)
+                if state_data is not None:
+                    states[agent_id] = state_data
+        return states
+
+    async def _save_many_to_redis(self, states: List[AgentStateData]) -> None:
+        """
+        通过 pipeline 一次往返批量保存到 Redis
+
+        Args:
+            states: 状态数据列表
+        """
+        async with self._redis_client.pipeline(transaction=False) as pipe:
+            for state_data in states:
+                key = f"agent:{state_data.agent_id}"
+                pipe.hset(key, mapping=_encode_state_hash(state_data))
+                pipe.expire(key, REDIS_STATE_TTL)
+            await pipe.execute()
+
+    async def _update_fields_in_redis(self, updates: Dict[int, Dict[str, Any]]) -> None:
+        """
+        通过一次脚本调用只更新 Redis 哈希中变化的字段
+
+        只更新仍存在的哈希并重置其过期时间，已删除或已过期的状态不会被部分字段重建。
+
+        Args:
+            updates: 智能体 ID 到待更新字段的映射
+        """
+        if not updates:
+            return
+
+        keys = []
+        args: List[Any] = [REDIS_STATE_TTL]
+        for agent_id, fields in updates.items():
+            keys.append(f"agent:{agent_id}")
+            args.append(len(fields))
+            for name, value in fields.items():
+                args.extend((name, value))
+
+        await self._redis_client.eval(_UPDATE_EXISTING_FIELDS_SCRIPT, len(keys), *keys, *args)
+
+    async def load_states(self, agent_ids: List[int]) -> Dict[int, AgentStateData]:
+        """
+        批量加载智能体状态
+
+        Args:
+            agent_ids: 智能体 ID 列表
+
+        Returns:
+            Dict[int, AgentStateData]: 智能体 ID 到状态数据的映射，不存在的状态不包含在内
+        """
+        if self._state_type == StateType.REDIS:
+            missing = [agent_id for agent_id in agent_ids if agent_id not in self._pending_writes]
+            states = await self._load_many_from_redis(missing) if missing else {}
+            for agent_id in agent_ids:
+                pending = self._pending_writes.get(agent_id)
+                if pending is not None:
+                    states[agent_id] = pending
+            return states
+
+        if self._state_type == StateType.DISK:
+            return await self._load_many_from_disk(agent_ids) if agent_ids else {}
+
+        # 内存存储直接按 ID 取出已有的状态对象，不为每个 ID 单独调度协程
+        memory_states = self._memory_states
+        return {
+            agent_id: memory_states[agent_id] for agent_id in agent_ids if agent_id in memory_states
+        }
+
+    async def save_states(self, states: List[AgentStateData]) -> None:
+        """
+        批量保存状态数据
+
+        Args:
+            states: 状态数据列表
+        """
+        if self._state_type == StateType.MEMORY:
+            for state_data in states:
+                self._memory_states[state_data.agent_id] = state_data
+
+        elif self._state_type == StateType.DISK:
+            await self._save_many_to_disk(states)
+
+        elif self._state_type == StateType.REDIS:
+            for state_data in states:
+                self._enqueue_write(state_data)
+
     async def delete_state(self, agent_id: int) -> bool:
         """
         删除智能体状态
@@ -227,21 +820,10 @@ class AgentStateManager:
             bool: 是否成功删除
         """
         try:
-            if self._state_type == StateType.MEMORY:
-                if agent_id in self._memory_states:
-                    del self._memory_states[agent_id]
-
-            elif self._state_type == StateType.DISK:
-                import os
+            await self._deleters[self._state_type](agent_id)
 
-                filename = f"agent_state_{agent_id}.json"
-                if os.path.exists(filename):
-                    os.remove(filename)
-
-            elif self._state_type == StateType.REDIS:
-                self._redis_client.delete(f"agent:{agent_id}")
-
-            logger.debug(f"智能体状态已删除: {agent_id}")
+            self._dirty.discard(agent_id)
+            logger.debug("智能体状态已删除: %s", agent_id)
             return True
 
         except Exception as e:
@@ -260,38 +842,105 @@ class AgentStateManager:
         if self._state_type == StateType.MEMORY:
             states = list(self._memory_states.values())
         elif self._state_type == StateType.DISK:
-            # 实现从磁盘加载所有状态
-            pass
+            states = await self._load_all_from_disk()
         elif self._state_type == StateType.REDIS:
-            # 实现从 Redis 加载所有状态
-            pass
+            states = await self._load_all_from_redis()
 
         return states
 
-    async def sync_with_db(self) -> int:
+    async def _load_all_from_disk(self) -> List[AgentStateData]:
         """
-        与数据库同步
+        从磁盘加载所有状态
 
         Returns:
-            int: 同步的状态数量
+            List[AgentStateData]: 智能体状态列表
         """
-        try:
-            agents = await DatabaseService.get_all_agents()
-            count = 0
+        db = await self._get_state_db()
+        async with db.execute("SELECT data FROM agent_states ORDER BY agent_id") as cursor:
+            rows = await cursor.fetchall()
+        validate_json = _state_adapter().validate_json
+        return [validate_json(data) for (data,) in rows]
 
-            for agent in agents:
-                if agent.status == AgentStatus.ACTIVE:
-                    state_data = await self.load_state(agent.id)
+    async def _load_all_from_redis(self, batch_size: int = 500) -> List[AgentStateData]:
+        """
+        从 Redis 加载所有状态
 
-                    if state_data:
-                        # 更新状态
-                        state_data.name = agent.name
-                        state_data.type = agent.type
-                        state_data.updated_at = datetime.utcnow()
+        使用 SCAN 分批遍历键（避免 KEYS 阻塞 Redis），每批键通过一次 pipeline 读取。
 
-                        await self.save_state(state_data)
-                        count += 1
+        Args:
+            batch_size: 每次 SCAN 建议返回的键数量
 
+        Returns:
+            List[AgentStateData]: 智能体状态列表
+        """
+        states: Dict[int, AgentStateData] = {}
+        cursor = 0
+        while True:
+            cursor, keys = await self._redis_client.scan(cursor, match="agent:*", count=batch_size)
+            if keys:
+                async with self._redis_client.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.hgetall(key)
+                    values = await pipe.execute()
+                for key, fields in zip(keys, values):
+                    if fields:
+                        state_data = _try_decode_state_hash(key, fields)
+                        if state_data is not None:
+                            states[state_data.agent_id] = state_data
+            if cursor == 0:
+                break
+
+        # 尚未写入 Redis 的状态以写入队列中的为准
+        states.update(self._pending_writes)
+        return list(states.values())
+
+    async def sync_with_db(self, agent_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        与数据库同步
+
+        Args:
+            agent_ids: 需要同步的智能体 ID，为空时同步所有智能体
+
+        Returns:
+            int: 同步的状态数量
+        """
+        try:
+            if agent_ids is None:
+                agents = await DatabaseService.get_all_agents()
+            else:
+                agents = await DatabaseService.get_agents_by_ids(list(agent_ids))
+            active_agents = [agent for agent in agents if agent.status == AgentStatus.ACTIVE]
+
+            # 一次批量读取、一次批量写回，而不是逐个智能体往返存储
+            states = await self.load_states([agent.id for agent in active_agents])
+            now = datetime.utcnow()
+            synced = []
+            for agent in active_agents:
+                state_data = states.get(agent.id)
+                if state_data:
+                    # 更新状态
+                    state_data.name = agent.name
+                    state_data.type = agent.type
+                    state_data.updated_at = now
+                    synced.append(state_data)
+
+            if synced and self._state_type == StateType.REDIS:
+                # 已写入 Redis 的状态只更新同步涉及的字段；仍在写入队列中的状态随队列整体写入
+                await self._update_fields_in_redis(
+                    {
+                        state_data.agent_id: {
+                            "name": state_data.name,
+                            "type": state_data.type.value,
+                            "updated_at": state_data.updated_at.isoformat(),
+                        }
+                        for state_data in synced
+                        if state_data.agent_id not in self._pending_writes
+                    }
+                )
+            elif synced:
+                await self.save_states(synced)
+
+            count = len(synced)
             logger.debug(f"已同步 {count} 个智能体状态")
             return count
         except Exception as e:
@@ -306,49 +955,63 @@ class AgentStateManagerFactory:
     """
 
     @staticmethod
-    def create_manager(
+    async def create_manager(
         state_type: StateType = StateType.MEMORY
     ) -> AgentStateManager:
         """
         创建状态管理器实例
 
+        经由 AgentStateManager.create 创建，Redis 不可用时降级为内存存储。
+
         Args:
             state_type: 状态存储类型
 
         Returns:
             AgentStateManager: 状态管理器实例
         """
-        return AgentStateManager(state_type)
+        return await AgentStateManager.create(state_type)
 
 
 # 默认状态管理器
 _default_manager: Optional[AgentStateManager] = None
+_default_manager_lock = threading.Lock()
 
 
-async def get_state_manager() -> AgentStateManager:
+def get_state_manager() -> AgentStateManager:
     """
     获取默认状态管理器实例
 
+    首次调用时在锁内创建，并发调用只会创建一次。
+
     Returns:
         AgentStateManager: 状态管理器实例
     """
     global _default_manager
 
-    if _default_manager is None:
-        _default_manager = AgentStateManagerFactory.create_manager()
+    manager = _default_manager
+    if manager is not None:
+        return manager
+
+    with _default_manager_lock:
+        if _default_manager is None:
+            # 默认使用内存存储，无需验证存储连接，可直接构造
+            _default_manager = AgentStateManager(StateType.MEMORY)
 
     return _default_manager
 
 
-async def sync_states_with_db():
+async def sync_states_with_db(batch_delay: float = 1.0):
     """
-    定期同步状态与数据库
+    在状态发生变化时同步状态与数据库
+
+    Args:
+        batch_delay: 同步完成后的等待时间（秒），期间的变化合并到下一次同步
     """
     while True:
         try:
-            await asyncio.sleep(300)  # 每 5 分钟同步一次
-            manager = await get_state_manager()
-            await manager.sync_with_db()
+            manager = get_state_manager()
+            await manager.sync_dirty()
+            await asyncio.sleep(batch_delay)
         except Exception as e:
             logger.error(f"状态同步失败: {e}")
             continue
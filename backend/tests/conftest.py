@@ -0,0 +1,52 @@
+"""
+测试公共配置
+将 backend 目录加入模块搜索路径，测试与生产代码一样以顶层包（models、services 等）导入模块
+"""
+
+import asyncio
+import os
+import pathlib
+import sys
+import tempfile
+from typing import Optional
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+# 未指定 DATABASE_URL 时，测试使用临时 SQLite 数据库，不触碰开发数据库；
+# 使用 pytest-xdist 并行运行时每个 worker 进程各自使用一个，避免相互争用。
+# worker 会继承主进程设置的环境变量，以 METISAI_TEST_DATABASE 区分是否为测试自动生成的地址
+_test_db_path: Optional[pathlib.Path] = None
+if not os.getenv("DATABASE_URL") or os.getenv("METISAI_TEST_DATABASE"):
+    os.environ["METISAI_TEST_DATABASE"] = "1"
+    _worker = os.getenv("PYTEST_XDIST_WORKER", "main")
+    _test_db_path = pathlib.Path(tempfile.gettempdir()) / f"metisai_test_{_worker}_{os.getpid()}.db"
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_test_db_path}"
+
+
+async def _create_test_tables() -> None:
+    """重建测试数据库的表结构"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from database import get_database_url
+    from models.base import Base
+
+    engine = create_async_engine(get_database_url())
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database():
+    """测试开始前为临时数据库建表，结束后删除临时数据库"""
+    if _test_db_path is not None:
+        asyncio.run(_create_test_tables())
+    yield
+    if _test_db_path is not None:
+        for path in _test_db_path.parent.glob(f"{_test_db_path.name}*"):
+            path.unlink(missing_ok=True)
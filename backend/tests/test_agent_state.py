@@ -0,0 +1,302 @@
+"""
+智能体状态管理测试模块
+用于测试状态管理器的存储后端、Redis 写入队列和降级逻辑
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from typing import List, Set
+from unittest.mock import AsyncMock, patch
+
+from agents.base import AgentOutput, AgentState, SimpleChatAgent
+from models.agent import AgentType
+from states import agent_state
+from states.agent_state import (
+    AgentStateData,
+    AgentStateManager,
+    AgentStateManagerFactory,
+    StateType,
+    StateWriteError,
+)
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  fakeredis 执行 Lua 脚本需要 lupa
+except ImportError:
+    fakeredis = None
+
+# 配置日志
+logging.basicConfig(
+    level=os.getenv("TEST_LOG_LEVEL", "WARNING"),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout,
+)
+logger = logging.getLogger(__name__)
+
+
+def _state(agent_id: int, name: str = "agent", **kwargs) -> AgentStateData:
+    """构造测试用的状态数据"""
+    now = datetime.utcnow()
+    return AgentStateData(
+        agent_id=agent_id,
+        name=name,
+        type=AgentType.CHAT,
+        state=AgentState.IDLE,
+        created_at=now,
+        updated_at=now,
+        **kwargs,
+    )
+
+
+class TestStateEncoding(unittest.TestCase):
+    """测试 Redis 哈希编码"""
+
+    def test_redis_hash_round_trip(self):
+        """测试状态数据编码为 Redis 哈希后能还原"""
+        state_data = _state(
+            1,
+            name="编码测试",
+            config={"model": "gpt-4", "temperature": 0.5},
+            history=[AgentOutput(response="你好").model_dump(mode="json")],
+            metadata={"tags": ["a", "b"]},
+        )
+
+        # Redis 以字节返回哈希的字段名和值
+        fields = {
+            key.encode(): value if isinstance(value, bytes) else str(value).encode()
+            for key, value in agent_state._encode_state_hash(state_data).items()
+        }
+
+        self.assertEqual(agent_state._decode_state_hash(fields), state_data)
+
+    def test_undecodable_hash_skipped(self):
+        """测试缺少字段的哈希解码为 None 而不是抛出异常"""
+        self.assertIsNone(agent_state._try_decode_state_hash("agent:9", {b"name": b"partial"}))
+
+
+class TestDiskStorage(unittest.IsolatedAsyncioTestCase):
+    """测试磁盘存储"""
+
+    async def asyncSetUp(self):
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.manager = AgentStateManager(
+            StateType.DISK, state_db_path=os.path.join(state_dir.name, "states.db")
+        )
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    async def test_disk_round_trip(self):
+        """测试保存、加载和删除磁盘中的状态"""
+        state_data = _state(1, config={"model": "gpt-4"}, metadata={"k": "v"})
+
+        await self.manager.save_states([state_data])
+
+        self.assertEqual(await self.manager.load_state(1), state_data)
+        self.assertEqual(await self.manager.load_states([1, 2]), {1: state_data})
+        self.assertEqual(await self.manager.get_all_states(), [state_data])
+
+        self.assertTrue(await self.manager.delete_state(1))
+        self.assertIsNone(await self.manager.load_state(1))
+
+    async def test_disk_rejects_older_write(self):
+        """测试保存时间早于已有记录的写入被忽略"""
+        with patch.object(agent_state, "time") as mock_time:
+            mock_time.time.return_value = 200.0
+            await self.manager.save_states([_state(1, name="newer")])
+
+            # 编码较慢的旧保存晚于新保存完成
+            mock_time.time.return_value = 100.0
+            await self.manager.save_states([_state(1, name="older")])
+
+        self.assertEqual((await self.manager.load_state(1)).name, "newer")
+
+
+class RedisQueueTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    Redis 写入队列测试基类
+    替换批量写入方法，由 fail_ids 控制哪些智能体的状态写入失败
+    """
+
+    manager_options = {}
+
+    async def asyncSetUp(self):
+        self.enterContext(patch.object(AgentStateManager, "_create_redis_client", return_value=AsyncMock()))
+        options = {
+            # 写入间隔足够长，写入时机完全由测试控制
+            "write_interval_ms": 60_000,
+            "write_retries": 2,
+            "retry_delay_ms": 1,
+            "max_write_failures": 3,
+            **self.manager_options,
+        }
+        self.manager = AgentStateManager(StateType.REDIS, **options)
+        self.fail_ids: Set[int] = set()
+        self.attempts = 0
+        self.written: List[AgentStateData] = []
+        self.enterContext(patch.object(self.manager, "_save_many_to_redis", side_effect=self._save_many))
+
+    async def asyncTearDown(self):
+        self.fail_ids.clear()
+        await self.manager.close()
+
+    async def _save_many(self, states: List[AgentStateData]) -> None:
+        self.attempts += 1
+        if any(state_data.agent_id in self.fail_ids for state_data in states):
+            raise ConnectionError("redis unavailable")
+        self.written.extend(states)
+
+
+class TestRedisWriteQueue(RedisQueueTestCase):
+    """测试 Redis 写入队列的重试、重新入队和丢弃"""
+
+    async def test_failed_state_requeued_then_dropped(self):
+        """测试写入失败的状态留在队列中，累计失败达到上限后丢弃"""
+        state_data = _state(1)
+        self.fail_ids.add(1)
+        await self.manager.save_states([state_data])
+
+        for failures in (1, 2):
+            with self.assertRaises(StateWriteError) as ctx:
+                await self.manager.flush()
+            self.assertEqual((ctx.exception.states, ctx.exception.requeued), ([state_data], 1))
+            self.assertIs(self.manager._pending_writes[1], state_data)
+            self.assertEqual(self.manager._write_failures, {1: failures})
+
+        # 每次 flush 内按重试次数尝试写入
+        self.assertEqual(self.attempts, 4)
+
+        with self.assertRaises(StateWriteError) as ctx:
+            await self.manager.flush()
+        self.assertEqual(ctx.exception.requeued, 0)
+        self.assertEqual((self.manager._pending_writes, self.manager._write_failures), ({}, {}))
+
+    async def test_requeued_state_written_on_retry(self):
+        """测试重新入队的状态在 Redis 恢复后写入并清除失败计数"""
+        state_data = _state(1)
+        self.fail_ids.add(1)
+        await self.manager.save_states([state_data])
+
+        with self.assertRaises(StateWriteError):
+            await self.manager.flush()
+
+        self.fail_ids.clear()
+        await self.manager.flush()
+
+        self.assertEqual(self.written, [state_data])
+        self.assertEqual((self.manager._pending_writes, self.manager._write_failures), ({}, {}))
+
+
+class TestRedisSaveWait(RedisQueueTestCase):
+    """测试等待写入的保存"""
+
+    # 每个状态单独成批写入，其他智能体的写入失败不会波及本次保存
+    manager_options = {"write_batch_size": 1, "max_write_failures": 10}
+
+    async def test_save_wait_reraises_only_own_failure(self):
+        """测试等待写入的保存只因本次保存的状态写入失败而失败"""
+        self.fail_ids.add(1)
+        await self.manager.save_states([_state(1)])
+
+        # 队列中其他智能体的状态写入失败不影响本次保存
+        self.assertTrue(await self.manager.save_state(SimpleChatAgent(2, "b"), wait=True))
+        self.assertEqual([state_data.agent_id for state_data in self.written], [2])
+        self.assertIn(1, self.manager._pending_writes)
+
+        self.assertFalse(await self.manager.save_state(SimpleChatAgent(1, "a"), wait=True))
+        self.assertIn(1, self.manager._pending_writes)
+
+
+class TestRedisQueueBackpressure(RedisQueueTestCase):
+    """测试队列满时的后台写入任务数量"""
+
+    manager_options = {"write_batch_size": 2}
+
+    async def test_full_queue_spawns_single_flush(self):
+        """测试写入较慢时持续入队只会有一个队列满触发的后台写入任务"""
+        release = asyncio.Event()
+        save_many = self._save_many
+
+        async def slow_save_many(states: List[AgentStateData]) -> None:
+            await release.wait()
+            await save_many(states)
+
+        self.manager._save_many_to_redis.side_effect = slow_save_many
+
+        await self.manager.save_states([_state(agent_id) for agent_id in range(20)])
+        await asyncio.sleep(0)
+
+        background = [
+            task for task in self.manager._tasks if task.get_coro().__name__ == "_background_flush"
+        ]
+        release.set()
+        self.assertEqual(len(background), 1)
+        self.assertIs(background[0], self.manager._flush_task)
+
+        await self.manager._flush_task
+        self.assertEqual(sorted(state_data.agent_id for state_data in self.written), list(range(20)))
+        self.assertEqual(self.manager._pending_writes, {})
+
+
+@unittest.skipIf(fakeredis is None, "需要安装 fakeredis[lua]")
+class TestRedisStorage(unittest.IsolatedAsyncioTestCase):
+    """测试基于 fakeredis 的 Redis 读写"""
+
+    async def asyncSetUp(self):
+        self.redis = fakeredis.FakeAsyncRedis()
+        self.enterContext(patch.object(AgentStateManager, "_create_redis_client", return_value=self.redis))
+        self.manager = await AgentStateManager.create(StateType.REDIS)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    async def test_update_fields_only_existing_keys(self):
+        """测试字段更新只作用于仍存在的哈希，并重置过期时间"""
+        await self.manager.save_states([_state(1, name="a"), _state(2, name="b")])
+        await self.manager.flush()
+        await self.redis.expire("agent:1", 5)
+        await self.redis.delete("agent:2")
+
+        await self.manager._update_fields_in_redis(
+            {1: {"name": "a2"}, 2: {"name": "ghost"}, 3: {"name": "missing"}}
+        )
+
+        self.assertEqual(await self.redis.hget("agent:1", "name"), b"a2")
+        self.assertGreater(await self.redis.ttl("agent:1"), 5)
+        self.assertEqual(await self.redis.exists("agent:2", "agent:3"), 0)
+        self.assertEqual((await self.manager.load_state(1)).name, "a2")
+
+    async def test_load_skips_undecodable_hashes(self):
+        """测试加载时跳过无法解码的哈希"""
+        await self.manager.save_states([_state(1)])
+        await self.manager.flush()
+        await self.redis.hset("agent:9", mapping={"name": "partial"})
+
+        self.assertEqual([state_data.agent_id for state_data in await self.manager.get_all_states()], [1])
+        self.assertEqual(list(await self.manager.load_states([1, 9])), [1])
+        self.assertIsNone(await self.manager.load_state(9))
+
+
+class TestRedisFallback(unittest.IsolatedAsyncioTestCase):
+    """测试 Redis 不可用时的降级"""
+
+    async def test_fallback_when_client_cannot_be_created(self):
+        """测试未安装 redis 或版本过低时降级为内存存储"""
+        for error in (ImportError("No module named 'redis'"), AttributeError("from_pool")):
+            with self.subTest(error=type(error).__name__):
+                with patch.object(AgentStateManager, "_create_redis_client", side_effect=error):
+                    manager = await AgentStateManagerFactory.create_manager(StateType.REDIS)
+
+                self.assertEqual(manager._state_type, StateType.MEMORY)
+                self.assertIsNone(manager._redis_client)
+                await manager.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,21 +5,20 @@
 
 import asyncio
 import logging
+import os
 import sys
 import unittest
 from typing import Any, Dict, List
 
-sys.path.append("E:/Project/MetisAI/MetisAI_03")
-
-from backend.agents.base import AgentConfig, AgentInput, AgentOutput, SimpleChatAgent
-from backend.agents.codeact import CodeActAgent, CodeActAgentConfig, CodeActAgentFactory
-from backend.controllers.agent_controller import get_agent_controller
-from backend.models.agent import AgentType
-from backend.services.db_service import DatabaseService
+from agents.base import AgentConfig, AgentInput, AgentOutput, SimpleChatAgent
+from agents.codeact import CodeActAgent, CodeActAgentConfig, CodeActAgentFactory
+from controllers.agent_controller import get_agent_controller
+from models.agent import AgentType
+from services.db_service import DatabaseService
 
 # 配置日志
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("TEST_LOG_LEVEL", "WARNING"),
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     stream=sys.stdout,
 )
@@ -39,7 +38,7 @@ class TestAgentBase(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(agent.name, "Test Agent")
         self.assertEqual(agent.type, AgentType.CHAT)
 
-        logger.debug(f"智能体状态: {agent.state_dict}")
+        logger.debug("智能体状态: %s", agent.state_dict)
 
         logger.info("测试智能体基类实例化完成")
 
@@ -50,7 +49,7 @@ class TestAgentBase(unittest.IsolatedAsyncioTestCase):
         agent = SimpleChatAgent(agent_id=2, name="State Test Agent")
         initial_state = agent.state
 
-        logger.debug(f"初始状态: {initial_state}")
+        logger.debug("初始状态: %s", initial_state)
 
         await agent.set_state(agent.state)
         self.assertEqual(agent.state, initial_state)
@@ -58,10 +57,38 @@ class TestAgentBase(unittest.IsolatedAsyncioTestCase):
         await agent.set_state(agent.state)
         self.assertEqual(agent.state, initial_state)
 
-        logger.debug(f"最终状态: {agent.state}")
+        logger.debug("最终状态: %s", agent.state)
 
         logger.info("测试智能体状态变化完成")
 
+    async def test_serialized_history_tracks_changes(self):
+        """测试历史记录序列化缓存随追加、替换和截断更新"""
+        agent = SimpleChatAgent(agent_id=3, name="History Test Agent")
+        first, second = AgentOutput(response="1"), AgentOutput(response="2")
+        agent.add_history(first)
+        agent.add_history(second)
+
+        cached = agent.serialized_history()
+        self.assertEqual([h["response"] for h in cached], ["1", "2"])
+
+        # 追加：已序列化的记录复用缓存的字典
+        agent.add_history(AgentOutput(response="3"))
+        appended = agent.serialized_history()
+        self.assertIs(appended[0], cached[0])
+        self.assertEqual([h["response"] for h in appended], ["1", "2", "3"])
+
+        # 等长替换其中一项
+        agent.history[1] = AgentOutput(response="2b")
+        self.assertEqual([h["response"] for h in agent.serialized_history()], ["1", "2b", "3"])
+
+        # 整体替换为更长的列表
+        agent.history = [AgentOutput(response=r) for r in ("a", "b", "c", "d")]
+        self.assertEqual([h["response"] for h in agent.serialized_history()], ["a", "b", "c", "d"])
+
+        # 截断
+        del agent.history[2:]
+        self.assertEqual([h["response"] for h in agent.serialized_history()], ["a", "b"])
+
 
 class TestCodeActAgent(unittest.IsolatedAsyncioTestCase):
     """测试 CodeAct 智能体"""
@@ -80,7 +107,7 @@ class TestCodeActAgent(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(agent.type, AgentType.CODEACT)
         self.assertEqual(agent.config.model, "claude-3-sonnet")
 
-        logger.debug(f"智能体配置: {agent.config.dict()}")
+        logger.debug("智能体配置: %s", agent.config.dict())
 
         logger.info("测试 CodeAct 智能体创建完成")
 
@@ -101,7 +128,7 @@ class TestCodeActAgent(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(agent.name, db_agent.name)
         self.assertEqual(agent.type, AgentType.CODEACT)
 
-        logger.debug(f"工厂创建的智能体: {agent.state_dict}")
+        logger.debug("工厂创建的智能体: %s", agent.state_dict)
 
         await DatabaseService.delete_agent(db_agent.id)
 
@@ -127,7 +154,7 @@ class TestCodeActAgent(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(result)
         self.assertIn("Hello, World!", result.response)
 
-        logger.debug(f"运行结果: {result}")
+        logger.debug("运行结果: %s", result)
 
         logger.info("测试 CodeAct 智能体运行完成")
 
@@ -162,7 +189,7 @@ class TestAgentController(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(agent)
         self.assertIn(agent.agent_id, [a.agent_id for a in await controller.get_all_agents()])
 
-        logger.debug(f"控制器创建的智能体: {agent.state_dict}")
+        logger.debug("控制器创建的智能体: %s", agent.state_dict)
 
         await controller.destroy_agent(agent.agent_id)
 
@@ -200,6 +227,24 @@ class TestAgentController(unittest.IsolatedAsyncioTestCase):
 
         logger.info("测试控制器智能体生命周期完成")
 
+    async def test_controller_destroy_agent_holding_lock(self):
+        """测试销毁智能体时在持有控制器锁的情况下停止智能体，不发生死锁"""
+        logger.info("开始测试控制器销毁智能体不死锁")
+
+        controller = await get_agent_controller()
+
+        agent = await controller.create_agent(
+            name="Destroy Lock Test Agent", type=AgentType.CHAT
+        )
+
+        # destroy_agent 持有不可重入的 _agent_lock 时停止智能体，死锁时超时失败而不是挂起
+        destroyed = await asyncio.wait_for(controller.destroy_agent(agent.agent_id), timeout=5)
+        self.assertTrue(destroyed)
+        self.assertIsNone(await controller.get_agent(agent.agent_id))
+        self.assertFalse(controller._agent_lock.locked())
+
+        logger.info("测试控制器销毁智能体不死锁完成")
+
 
 class TestAgentIntegration(unittest.IsolatedAsyncioTestCase):
     """测试智能体集成功能"""
@@ -235,7 +280,7 @@ class TestAgentIntegration(unittest.IsolatedAsyncioTestCase):
         controller = await get_agent_controller()
         health_info = await controller.health_check()
 
-        logger.debug(f"健康检查信息: {health_info}")
+        logger.debug("健康检查信息: %s", health_info)
 
         self.assertGreater(health_info["total_agents"], 0)
         self.assertGreater(health_info["active_agents"], 0)
@@ -5,31 +5,122 @@
 
 import asyncio
 import logging
+import os
 import sys
+import itertools
 import unittest
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
 
-sys.path.append("E:/Project/MetisAI/MetisAI_03")
-
-from backend.models.conversation import ConversationStatus
-from backend.models.message import MessageRole
-from backend.services.conversation_manager import (
-    ConversationManager,
-    Session,
-    get_conversation_manager,
-)
-from backend.services.db_service import DatabaseService
+from models.conversation import Conversation, ConversationStatus
+from models.message import Message, MessageRole
+from services import conversation_manager
+from services.conversation_manager import ConversationManager, Session
+from services.db_service import DatabaseService
 
 # 配置日志
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv("TEST_LOG_LEVEL", "WARNING"),
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     stream=sys.stdout,
 )
 logger = logging.getLogger(__name__)
 
+# 批量会话测试使用的用户和标题
+_BULK_USERS = [f"test_user_{i}" for i in range(3)]
+_BULK_TITLES = [f"批量创建会话 {i}" for i in range(3)]
+
+
+class InMemoryDatabaseService:
+    """
+    内存数据库服务替身
+    以字典保存会话和消息，供不需要持久化的单元测试替换 DatabaseService
+    """
+
+    _ids = itertools.count(1)
+    conversations: Dict[int, Conversation] = {}
+    messages: Dict[int, List[Message]] = {}
+
+    @classmethod
+    def reset(cls) -> None:
+        """清空所有数据"""
+        cls._ids = itertools.count(1)
+        cls.conversations.clear()
+        cls.messages.clear()
+
+    @classmethod
+    async def create_conversation(cls, conversation: Conversation) -> Conversation:
+        conversation.id = next(cls._ids)
+        cls.conversations[conversation.id] = conversation
+        return conversation
+
+    @classmethod
+    async def update_conversation(cls, conversation_id: int, **values: Any) -> Optional[Conversation]:
+        conversation = cls.conversations.get(conversation_id)
+        if conversation is not None:
+            for key, value in values.items():
+                setattr(conversation, "metadata_" if key == "metadata" else key, value)
+        return conversation
+
+    @classmethod
+    async def delete_conversation(cls, conversation_id: int) -> bool:
+        cls.messages.pop(conversation_id, None)
+        return cls.conversations.pop(conversation_id, None) is not None
+
+    @classmethod
+    async def get_active_conversations(cls) -> List[Conversation]:
+        return [c for c in cls.conversations.values() if c.status == ConversationStatus.ACTIVE]
+
+    @classmethod
+    async def count_messages_by_conversation(cls, conversation_ids: List[int]) -> Dict[int, int]:
+        return {cid: len(cls.messages[cid]) for cid in conversation_ids if cid in cls.messages}
+
+    @classmethod
+    async def get_recent_messages(cls, conversation_id: int, limit: int) -> List[Message]:
+        return cls.messages.get(conversation_id, [])[-limit:]
+
+    @classmethod
+    async def get_recent_messages_by_conversations(
+        cls, conversation_ids: List[int], limit: int
+    ) -> Dict[int, List[Message]]:
+        return {cid: cls.messages[cid][-limit:] for cid in conversation_ids if cid in cls.messages}
+
+
+class InMemoryMessageBuffer:
+    """内存消息写入缓冲区替身，消息直接写入 InMemoryDatabaseService"""
+
+    def add(self, message: Message) -> None:
+        InMemoryDatabaseService.messages.setdefault(message.conversation_id, []).append(message)
+
+    async def flush(self) -> None:
+        pass
+
+
+class InMemoryDatabaseMixin:
+    """将会话管理模块的数据库访问替换为内存实现，测试结束后自动恢复"""
+
+    def setUp(self):
+        super().setUp()
+        InMemoryDatabaseService.reset()
+        self.enterContext(patch.object(conversation_manager, "DatabaseService", InMemoryDatabaseService))
+        self.enterContext(patch.object(conversation_manager, "message_write_buffer", InMemoryMessageBuffer()))
+
+
+class ManagerTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    会话管理器测试基类
+    每个测试使用独立的事件循环，管理器的过期清理任务与事件循环绑定，因此每个测试各自创建并关闭管理器
+    """
+
+    async def asyncSetUp(self):
+        self._manager = ConversationManager()
+        await self._manager.initialize()
+
+    async def asyncTearDown(self):
+        await self._manager.shutdown()
 
-class TestSession(unittest.IsolatedAsyncioTestCase):
+
+class TestSession(InMemoryDatabaseMixin, unittest.IsolatedAsyncioTestCase):
     """测试会话类"""
 
     async def test_session_creation(self):
@@ -38,17 +129,28 @@ class TestSession(unittest.IsolatedAsyncioTestCase):
 
         session = Session(session_id=1, user_id="test_user", agent_id=1, title="测试会话")
 
-        self.assertEqual(session.session_id, 1)
-        self.assertEqual(session.user_id, "test_user")
-        self.assertEqual(session.agent_id, 1)
-        self.assertEqual(session.title, "测试会话")
-        self.assertEqual(session.status, ConversationStatus.ACTIVE)
-        self.assertTrue(session.is_active)
+        self.assertEqual(
+            (session.session_id, session.user_id, session.agent_id, session.title, session.status, session.is_active),
+            (1, "test_user", 1, "测试会话", ConversationStatus.ACTIVE, True),
+        )
 
-        logger.debug(f"会话状态: {session.session_dict}")
+        logger.debug("会话状态: %s", session.session_dict)
 
         logger.info("测试会话创建完成")
 
+    async def test_session_dict_isolated_from_callers(self):
+        """测试修改 session_dict 的返回值不影响缓存和会话"""
+        session = Session(session_id=5, user_id="test_user", title="字典测试", metadata={"k": "v"})
+
+        result = session.session_dict
+        result["extra"] = 1
+        result["metadata"]["k"] = "changed"
+
+        again = session.session_dict
+        self.assertIsNot(again, result)
+        self.assertNotIn("extra", again)
+        self.assertEqual((again["metadata"], session.metadata), ({"k": "v"}, {"k": "v"}))
+
     async def test_session_message_management(self):
         """测试会话消息管理"""
         logger.info("开始测试会话消息管理")
@@ -58,11 +160,10 @@ class TestSession(unittest.IsolatedAsyncioTestCase):
         # 添加用户消息
         user_message = await session.add_message(MessageRole.USER, "你好，这是测试消息")
         self.assertIsNotNone(user_message)
-        self.assertEqual(user_message.role, MessageRole.USER)
+        self.assertEqual((user_message.role, session.message_count), (MessageRole.USER, 1))
         self.assertIn("测试消息", user_message.content)
-        self.assertEqual(session.message_count, 1)
 
-        logger.debug(f"添加用户消息后消息数量: {session.message_count}")
+        logger.debug("添加用户消息后消息数量: %s", session.message_count)
 
         # 添加智能体消息
         agent_message = await session.add_message(
@@ -71,60 +172,55 @@ class TestSession(unittest.IsolatedAsyncioTestCase):
             metadata={"model": "claude-3-opus"},
         )
         self.assertIsNotNone(agent_message)
-        self.assertEqual(agent_message.role, MessageRole.AGENT)
+        self.assertEqual((agent_message.role, session.message_count), (MessageRole.AGENT, 2))
         self.assertIn("智能体的回复", agent_message.content)
-        self.assertEqual(session.message_count, 2)
 
-        logger.debug(f"添加智能体消息后消息数量: {session.message_count}")
+        logger.debug("添加智能体消息后消息数量: %s", session.message_count)
 
         # 获取所有消息
         messages = await session.get_messages()
         self.assertEqual(len(messages), 2)
 
-        logger.debug(f"消息列表: {[msg.content for msg in messages]}")
-
-        logger.info("测试会话消息管理完成")
-
-    async def test_session_completion(self):
-        """测试会话完成"""
-        logger.info("开始测试会话完成")
-
-        session = Session(session_id=3, user_id="test_user", title="完成测试会话")
+        # 按对象身份校验消息顺序
+        self.assertIs(messages[0], user_message)
+        self.assertIs(messages[1], agent_message)
 
-        await session.complete()
-        self.assertEqual(session.status, ConversationStatus.COMPLETED)
-        self.assertFalse(session.is_active)
-        self.assertIsNotNone(session.completed_at)
+        logger.debug("消息列表长度=%d 首条=%r", len(messages), messages[0].content if messages else None)
 
-        logger.debug(f"会话完成时间: {session.completed_at}")
-
-        logger.info("测试会话完成完成")
+        logger.info("测试会话消息管理完成")
 
-    async def test_session_cancellation(self):
-        """测试会话取消"""
-        logger.info("开始测试会话取消")
+    async def test_session_terminal_states(self):
+        """测试会话完成与取消"""
+        logger.info("开始测试会话结束状态")
 
-        session = Session(session_id=4, user_id="test_user", title="取消测试会话")
+        cases = [
+            (3, ConversationStatus.COMPLETED, "complete", "完成测试会话"),
+            (4, ConversationStatus.CANCELED, "cancel", "取消测试会话"),
+        ]
+        for session_id, status, operation, title in cases:
+            with self.subTest(status=status):
+                session = Session(session_id=session_id, user_id="test_user", title=title)
 
-        await session.cancel()
-        self.assertEqual(session.status, ConversationStatus.CANCELED)
-        self.assertFalse(session.is_active)
-        self.assertIsNotNone(session.completed_at)
+                await getattr(session, operation)()
+                self.assertEqual((session.status, session.is_active), (status, False))
+                self.assertIsNotNone(session.completed_at)
 
-        logger.debug(f"会话取消时间: {session.completed_at}")
+                logger.debug("会话结束时间: %s", session.completed_at)
 
-        logger.info("测试会话取消完成")
+        logger.info("测试会话结束状态完成")
 
 
-class TestConversationManager(unittest.IsolatedAsyncioTestCase):
+class TestConversationManager(InMemoryDatabaseMixin, ManagerTestCase):
     """测试会话管理器"""
 
     async def test_manager_initialization(self):
         """测试会话管理器初始化"""
         logger.info("开始测试会话管理器初始化")
 
-        manager = await get_conversation_manager()
+        manager = self._manager
         self.assertIsNotNone(manager)
+        self.assertIsNotNone(manager._cleanup_task)
+        self.assertFalse(manager._cleanup_task.done())
 
         logger.debug("会话管理器实例化成功")
 
@@ -134,7 +230,7 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
         """测试创建会话"""
         logger.info("开始测试创建会话")
 
-        manager = await get_conversation_manager()
+        manager = self._manager
 
         # 创建会话
         session = await manager.create_session(
@@ -145,15 +241,15 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
         )
 
         self.assertIsNotNone(session)
-        self.assertEqual(session.user_id, "test_user_1")
-        self.assertEqual(session.agent_id, 1)
-        self.assertEqual(session.title, "测试会话 1")
-        self.assertTrue(session.is_active)
+        self.assertEqual(
+            (session.user_id, session.agent_id, session.title, session.is_active),
+            ("test_user_1", 1, "测试会话 1", True),
+        )
 
-        logger.debug(f"创建的会话: {session.session_dict}")
+        logger.debug("创建的会话: %s", session.session_dict)
 
         # 验证会话是否在管理器中
-        retrieved_session = await manager.get_session(session.session_id)
+        retrieved_session = manager.get_session(session.session_id)
         self.assertIsNotNone(retrieved_session)
         self.assertEqual(retrieved_session.session_id, session.session_id)
 
@@ -161,7 +257,7 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
 
         # 测试会话删除
         await manager.delete_session(session.session_id)
-        deleted_session = await manager.get_session(session.session_id)
+        deleted_session = manager.get_session(session.session_id)
         self.assertIsNone(deleted_session)
 
         logger.info("测试创建会话完成")
@@ -170,7 +266,7 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
         """测试会话生命周期"""
         logger.info("开始测试会话生命周期")
 
-        manager = await get_conversation_manager()
+        manager = self._manager
 
         # 创建会话
         session = await manager.create_session(
@@ -190,25 +286,21 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
         messages = await manager.get_session_messages(session.session_id)
         self.assertEqual(len(messages), 1)
 
-        logger.debug(f"会话消息数量: {len(messages)}")
+        logger.debug("会话消息数量: %s", len(messages))
 
         # 测试会话更新
         new_title = "更新后的会话标题"
-        await manager.update_session_title(session.session_id, new_title)
-
-        updated_session = await manager.get_session(session.session_id)
+        updated_session = await manager.update_session_title(session.session_id, new_title)
         self.assertEqual(updated_session.title, new_title)
 
-        logger.debug(f"会话标题已更新为: {new_title}")
+        logger.debug("会话标题已更新为: %s", new_title)
 
         # 测试会话完成
-        await manager.complete_session(session.session_id)
-
-        completed_session = await manager.get_session(session.session_id)
+        completed_session = await manager.complete_session(session.session_id)
         self.assertEqual(completed_session.status, ConversationStatus.COMPLETED)
         self.assertFalse(completed_session.is_active)
 
-        logger.debug(f"会话状态已变为: {completed_session.status.value}")
+        logger.debug("会话状态已变为: %s", completed_session.status.value)
 
         await manager.delete_session(session.session_id)
 
@@ -218,16 +310,31 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
         """测试会话健康检查"""
         logger.info("开始测试会话健康检查")
 
-        manager = await get_conversation_manager()
-        health_info = await manager.health_check()
+        manager = self._manager
+
+        # 每个测试使用全新的管理器，计数从零开始；按已知序列查询：3 次命中、1 次未命中
+        session = await manager.create_session(user_id="test_user_health", title="健康检查测试会话")
+        self.assertEqual((manager._hits, manager._misses), (0, 0))
+        for _ in range(3):
+            self.assertIs(manager.get_session(session.session_id), session)
+        self.assertIsNone(manager.get_session(session.session_id + 1))
+        self.assertEqual((manager._hits, manager._misses), (3, 1))
+
+        health_info = manager.health_check()
 
         self.assertIsNotNone(health_info)
         self.assertIn("total_sessions", health_info)
         self.assertIn("active_sessions", health_info)
         self.assertIn("total_messages", health_info)
         self.assertIn("status", health_info)
+        self.assertEqual(
+            (health_info["session_hits"], health_info["session_misses"]), (3, 1)
+        )
+        self.assertEqual(health_info["hit_ratio"], 3 / 4)
+
+        await manager.delete_session(session.session_id)
 
-        logger.debug(f"健康检查信息: {health_info}")
+        logger.debug("健康检查信息: %s", health_info)
 
         logger.info("测试会话健康检查完成")
 
@@ -235,37 +342,35 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
         """测试批量会话操作"""
         logger.info("开始测试批量会话操作")
 
-        manager = await get_conversation_manager()
+        manager = self._manager
 
-        # 批量创建会话
-        session_ids: List[int] = []
-        for i in range(3):
-            session = await manager.create_session(
-                user_id=f"test_user_{i}",
-                agent_id=1,
-                title=f"批量创建会话 {i}",
+        # 批量并发创建会话，gather 保持返回顺序
+        sessions = await asyncio.gather(
+            *(
+                manager.create_session(user_id=user_id, agent_id=1, title=title)
+                for user_id, title in zip(_BULK_USERS, _BULK_TITLES)
             )
-            session_ids.append(session.session_id)
+        )
+        session_ids: List[int] = [session.session_id for session in sessions]
 
-        logger.debug(f"批量创建的会话: {session_ids}")
+        logger.debug("批量创建的会话: %s", session_ids)
 
         # 获取用户的所有会话
-        user_sessions = await manager.get_sessions_by_user("test_user_0")
+        user_sessions = manager.get_sessions_by_user("test_user_0")
         self.assertEqual(len(user_sessions), 1)
         self.assertEqual(user_sessions[0].user_id, "test_user_0")
 
-        logger.debug(f"用户 test_user_0 的会话数量: {len(user_sessions)}")
+        logger.debug("用户 test_user_0 的会话数量: %s", len(user_sessions))
 
         # 获取所有活动会话
-        active_sessions = await manager.get_active_sessions()
+        active_sessions = manager.get_active_sessions()
         active_ids = [session.session_id for session in active_sessions]
         self.assertTrue(all(sid in active_ids for sid in session_ids))
 
-        logger.debug(f"活动会话数量: {len(active_sessions)}")
+        logger.debug("活动会话数量: %s", len(active_sessions))
 
-        # 删除所有创建的会话
-        for session_id in session_ids:
-            await manager.delete_session(session_id)
+        # 并发删除所有创建的会话
+        await asyncio.gather(*(manager.delete_session(session_id) for session_id in session_ids))
 
         logger.info("测试批量会话操作完成")
 
@@ -273,7 +378,7 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
         """测试会话超时"""
         logger.info("开始测试会话超时")
 
-        manager = await get_conversation_manager()
+        manager = self._manager
 
         # 创建会话
         session = await manager.create_session(
@@ -281,33 +386,45 @@ class TestConversationManager(unittest.IsolatedAsyncioTestCase):
             title="超时测试会话",
         )
 
-        # 设置一个非常短的超时时间进行测试
-        await session.set_timeout(1.0)  # 1 秒超时
+        # 设置为立即超时，无需真实等待
+        session.set_timeout(0.0)
 
-        logger.debug("会话超时已设置为 1 秒")
+        logger.debug("会话超时已设置为 0 秒")
 
-        # 等待超时
-        await asyncio.sleep(1.5)
+        # 等待当前事件循环上的过期清理任务完成会话（有上限，过期逻辑失效时测试失败而不是挂起）
+        async def wait_for_expiry():
+            while session.is_active:
+                await asyncio.sleep(0.01)
 
-        # 获取会话状态
-        retrieved_session = await manager.get_session(session.session_id)
-        self.assertIsNotNone(retrieved_session)
+        await asyncio.wait_for(wait_for_expiry(), timeout=1.0)
 
-        logger.debug(f"会话状态: {retrieved_session.status.value}")
+        # 超时的会话被自动完成并移出活动索引，但仍保留在管理器中
+        retrieved_session = manager.get_session(session.session_id)
+        self.assertIs(retrieved_session, session)
+        self.assertEqual(retrieved_session.status, ConversationStatus.COMPLETED)
+        self.assertNotIn(session.session_id, manager._active_session_ids)
+        self.assertNotIn(session.session_id, manager._scheduled)
+
+        logger.debug("会话状态: %s", retrieved_session.status.value)
 
         await manager.delete_session(session.session_id)
 
         logger.info("测试会话超时完成")
 
 
-class TestConversationManagerIntegration(unittest.IsolatedAsyncioTestCase):
+class TestConversationManagerIntegration(ManagerTestCase):
     """测试会话管理器与数据库集成"""
 
+    async def asyncSetUp(self):
+        # 连接与事件循环绑定，在运行测试的事件循环中预热连接池，冷启动开销不计入测试主体
+        await DatabaseService.warmup()
+        await super().asyncSetUp()
+
     async def test_manager_db_integration(self):
         """测试会话管理器与数据库集成"""
         logger.info("开始测试会话管理器与数据库集成")
 
-        manager = await get_conversation_manager()
+        manager = self._manager
 
         # 创建会话
         session = await manager.create_session(
@@ -333,7 +450,7 @@ class TestConversationManagerIntegration(unittest.IsolatedAsyncioTestCase):
         """测试会话消息数据库同步"""
         logger.info("开始测试会话消息数据库同步")
 
-        manager = await get_conversation_manager()
+        manager = self._manager
 
         # 创建会话
         session = await manager.create_session(
@@ -348,6 +465,9 @@ class TestConversationManagerIntegration(unittest.IsolatedAsyncioTestCase):
             "数据库同步测试消息",
         )
 
+        # 消息经缓冲区异步写入，读取前先写入缓冲区中的消息
+        await manager.flush()
+
         # 从数据库直接获取消息
         db_messages = await DatabaseService.get_messages_by_conversation(session.session_id)
         self.assertEqual(len(db_messages), 1)
@@ -0,0 +1,162 @@
+"""
+数据库服务测试模块
+用于测试消息写入缓冲区的批量写入、重试和丢弃逻辑
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import unittest
+from typing import List
+from unittest.mock import AsyncMock, call, patch
+
+from models.message import Message, MessageRole
+from services import db_service
+from services.db_service import DatabaseService, MessageWriteBuffer, MessageWriteError
+
+# 配置日志
+logging.basicConfig(
+    level=os.getenv("TEST_LOG_LEVEL", "WARNING"),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout,
+)
+logger = logging.getLogger(__name__)
+
+
+def _message(content: str) -> Message:
+    """构造测试用的消息"""
+    return Message(conversation_id=1, role=MessageRole.USER, content=content)
+
+
+class MessageBufferTestCase(unittest.IsolatedAsyncioTestCase):
+    """
+    消息写入缓冲区测试基类
+    替换批量写入方法，包含 bad 中任一消息的批次写入失败
+    """
+
+    buffer_options = {}
+
+    async def asyncSetUp(self):
+        options = {
+            # 等待时间足够长，写入时机完全由测试控制
+            "max_age_ms": 60_000,
+            "max_retries": 3,
+            "retry_delay_ms": 10,
+            "max_failures": 3,
+            **self.buffer_options,
+        }
+        self.buffer = MessageWriteBuffer(**options)
+        self.bad: List[Message] = []
+        self.written: List[Message] = []
+        self.create_messages = self.enterContext(
+            patch.object(DatabaseService, "create_messages", side_effect=self._create_messages)
+        )
+
+    async def _create_messages(self, messages: List[Message]) -> List[Message]:
+        if any(message in self.bad for message in messages):
+            raise ConnectionError("database unavailable")
+        self.written.extend(messages)
+        return messages
+
+
+class TestMessageWriteBuffer(MessageBufferTestCase):
+    """测试消息写入缓冲区的重试、逐条写入、重新入队和丢弃"""
+
+    async def test_batch_retried_with_backoff(self):
+        """测试批次写入失败时按指数退避重试"""
+        messages = [_message("1"), _message("2")]
+        for message in messages:
+            self.buffer.add(message)
+        self.create_messages.side_effect = [ConnectionError("locked"), ConnectionError("locked"), messages]
+
+        with patch.object(db_service.asyncio, "sleep", AsyncMock()) as sleep:
+            await self.buffer.flush()
+
+        self.assertEqual(self.create_messages.await_args_list, [call(messages)] * 3)
+        self.assertEqual(sleep.await_args_list, [call(0.01), call(0.02)])
+        self.assertEqual(self.buffer.pending_count, 0)
+
+    async def test_failed_batch_falls_back_to_single_writes(self):
+        """测试批次重试耗尽后逐条写入，只有写入失败的消息放回缓冲区"""
+        good, bad = _message("good"), _message("bad")
+        self.bad.append(bad)
+        for message in (good, bad):
+            self.buffer.add(message)
+
+        with self.assertRaises(MessageWriteError) as ctx:
+            await self.buffer.flush()
+
+        self.assertEqual((ctx.exception.messages, ctx.exception.requeued), ([bad], 1))
+        self.assertIsInstance(ctx.exception.cause, ConnectionError)
+        self.assertEqual(self.written, [good])
+        self.assertEqual(self.buffer._pending, [bad])
+
+    async def test_failed_messages_requeued_in_order(self):
+        """测试写入失败的消息按原顺序放回缓冲区，恢复后写入并清除失败计数"""
+        messages = [_message(str(i)) for i in range(4)]
+        self.bad.extend(messages[1::2])
+        for message in messages:
+            self.buffer.add(message)
+
+        with self.assertRaises(MessageWriteError):
+            await self.buffer.flush()
+        self.assertEqual(self.buffer._pending, messages[1::2])
+
+        self.bad.clear()
+        await self.buffer.flush()
+
+        self.assertEqual(self.written, messages[::2] + messages[1::2])
+        self.assertEqual((self.buffer._pending, self.buffer._failures), ([], {}))
+
+    async def test_message_dropped_after_max_failures(self):
+        """测试消息累计写入失败达到上限后丢弃"""
+        message = _message("bad")
+        self.bad.append(message)
+        self.buffer.add(message)
+
+        for failures in (1, 2):
+            with self.assertRaises(MessageWriteError) as ctx:
+                await self.buffer.flush()
+            self.assertEqual(ctx.exception.requeued, 1)
+            self.assertEqual(self.buffer._failures, {id(message): failures})
+
+        with self.assertRaises(MessageWriteError) as ctx:
+            await self.buffer.flush()
+        self.assertEqual(ctx.exception.requeued, 0)
+        self.assertEqual((self.buffer._pending, self.buffer._failures), ([], {}))
+
+
+class TestMessageWriteBufferBackpressure(MessageBufferTestCase):
+    """测试缓冲区满时的后台写入任务数量"""
+
+    buffer_options = {"max_batch": 2}
+
+    async def test_full_buffer_spawns_single_flush(self):
+        """测试写入较慢时持续加入消息只会有一个缓冲区满触发的后台写入任务"""
+        release = asyncio.Event()
+        create_messages = self._create_messages
+
+        async def slow_create_messages(messages: List[Message]) -> List[Message]:
+            await release.wait()
+            return await create_messages(messages)
+
+        self.create_messages.side_effect = slow_create_messages
+
+        messages = [_message(str(i)) for i in range(20)]
+        for message in messages:
+            self.buffer.add(message)
+        await asyncio.sleep(0)
+
+        background = [task for task in self.buffer._tasks if task.get_coro().__name__ == "_background_flush"]
+        release.set()
+        self.assertEqual(len(background), 1)
+        self.assertIs(background[0], self.buffer._flush_task)
+
+        await self.buffer._flush_task
+        self.assertEqual(self.written, messages)
+        self.assertEqual(self.buffer.pending_count, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,23 @@
 import sys
 import asyncio
 sys.path.append("E:\\Project\\MetisAI\\MetisAI_03\\backend")
+import pytest
 from fastapi.testclient import TestClient
 from main import app
 
-def test_list_agents():
-    client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def client():
+    # 模块内所有 API 测试共用一个客户端，应用启动流程只执行一次
+    with TestClient(app) as c:
+        yield c
+
+
+def test_list_agents(client):
     response = client.get("/api/v1/agents/")
     print(f"状态码: {response.status_code}")
     print(f"响应内容: {response.json()}")
 
 if __name__ == "__main__":
-    test_list_agents()
+    with TestClient(app) as client:
+        test_list_agents(client)